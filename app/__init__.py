@@ -23,7 +23,9 @@ def create_app(config_object=Config):
 
     # Import and initialize database
     from app.models.models import db
+    from app.models.async_db import database
     db.init_app(app)
+    database.init_app(app)  # Async engine for the repository functions
 
     # Import blueprints inside function to avoid circular imports
     from app.routes.fighter_routes import fighter_bp
@@ -32,12 +34,21 @@ def create_app(config_object=Config):
     app.register_blueprint(fighter_bp, url_prefix='/api')
     app.register_blueprint(session_bp, url_prefix='/api')
 
-    # Create database tables only if they don't exist
+    # Create the database tables that don't exist yet
     with app.app_context():
         from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        if not inspector.get_table_names():
-            logging.info("Creating database tables")
+        existing = set(inspect(db.engine).get_table_names())
+        missing = [name for name in db.metadata.tables if name not in existing]
+        if missing:
+            logging.info(f"Creating database tables: {', '.join(missing)}")
             db.create_all()
+            if existing and 'punch_stats' in missing:
+                # Older databases: roll up the punches recorded before the table existed
+                from app.services.punch_stats import rebuild_punch_stats
+                rebuild_punch_stats()
+        # Indexes added to tables that already existed
+        for name in existing & set(db.metadata.tables):
+            for index in db.metadata.tables[name].indexes:
+                index.create(db.engine, checkfirst=True)
 
     return app
\ No newline at end of file
@@ -12,6 +12,11 @@ class Config:
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')  # Derived from DATABASE_URL when unset
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # Async engine connections
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Seconds before a connection is replaced
 
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key')
@@ -26,4 +31,100 @@ class Config:
         CAMERA_IDS = [int(x) for x in CAMERA_IDS.split(',') if x.isdigit()]
     except ValueError:
         logging.warning("Invalid CAMERA_IDS format. Using empty list.")
-        CAMERA_IDS = []
\ No newline at end of file
+        CAMERA_IDS = []
+    CAMERA_MERGE_WINDOW_MS = float(os.environ.get('CAMERA_MERGE_WINDOW_MS', 100))  # Cross-camera reordering
+    CAPTURE_WIDTH = int(os.environ.get('CAPTURE_WIDTH', 480))
+    CAPTURE_HEIGHT = int(os.environ.get('CAPTURE_HEIGHT', 360))
+    CAPTURE_FPS = int(os.environ.get('CAPTURE_FPS', 15))
+
+    # Inference batching
+    INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', 4))
+    INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 10))
+    INFERENCE_MAX_IN_FLIGHT = int(os.environ.get('INFERENCE_MAX_IN_FLIGHT', 2))  # Per camera
+
+    # Inference gating: skip static frames, crop to the people we are tracking
+    MOTION_GATE = os.environ.get('MOTION_GATE', 'True').lower() in ['true', '1']
+    MOTION_THRESHOLD = float(os.environ.get('MOTION_THRESHOLD', 2.0))  # Mean abs diff, 0-255
+    MOTION_STATIC_STRIDE = int(os.environ.get('MOTION_STATIC_STRIDE', 5))  # Infer 1 in N static frames
+    ROI_MODE = os.environ.get('ROI_MODE', 'True').lower() in ['true', '1']
+    ROI_MARGIN = float(os.environ.get('ROI_MARGIN', 0.2))
+    ROI_FULL_FRAME_INTERVAL = int(os.environ.get('ROI_FULL_FRAME_INTERVAL', 15))
+
+    # Adaptive control: ladder of skip_frames:imgsz levels (imgsz 0 = model default)
+    ADAPTIVE_CONTROL = os.environ.get('ADAPTIVE_CONTROL', 'True').lower() in ['true', '1']
+    ADAPTIVE_TARGET_LATENCY_MS = float(os.environ.get('ADAPTIVE_TARGET_LATENCY_MS', 150))
+    ADAPTIVE_MAX_QUEUE_DEPTH = int(os.environ.get('ADAPTIVE_MAX_QUEUE_DEPTH', 4))
+    ADAPTIVE_LADDER = os.environ.get('ADAPTIVE_LADDER', '1:0,1:480,2:480,2:320,3:256')
+    try:
+        ADAPTIVE_LADDER = [(int(skip), int(imgsz) or None)
+                           for skip, imgsz in (level.split(':') for level in ADAPTIVE_LADDER.split(','))]
+    except ValueError:
+        logging.warning("Invalid ADAPTIVE_LADDER format. Using a single full-quality level.")
+        ADAPTIVE_LADDER = [(1, None)]
+
+    # Pose model
+    POSE_MODEL_NAME = os.environ.get('POSE_MODEL_NAME', 'yolov8n-pose.pt')
+    POSE_MODEL_DEVICE = os.environ.get('POSE_MODEL_DEVICE')  # None picks cuda when available
+    MODEL_POOL_SIZE = int(os.environ.get('MODEL_POOL_SIZE', 1))  # Concurrent inference instances
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'True').lower() in ['true', '1']
+
+    # Inference backend: 'torch', 'onnx', 'openvino', or 'auto' to calibrate on startup
+    POSE_BACKEND = os.environ.get('POSE_BACKEND', 'torch').lower()
+    POSE_IMGSZ = int(os.environ.get('POSE_IMGSZ', 0)) or None  # None keeps the model default
+    POSE_THREADS = int(os.environ.get('POSE_THREADS', 0)) or None
+    CALIBRATION_FRAME = os.environ.get('CALIBRATION_FRAME')  # Image with people in it, if any
+    CALIBRATION_IMGSZ = [int(x) for x in os.environ.get('CALIBRATION_IMGSZ', '320,416,480,640').split(',') if x.isdigit()]
+    CALIBRATION_TOLERANCE = float(os.environ.get('CALIBRATION_TOLERANCE', 0.02))  # Of the frame diagonal
+    BACKEND_CACHE_PATH = os.environ.get('BACKEND_CACHE_PATH', 'backend_calibration.json')
+
+    # Tracking
+    TRACK_IOU_THRESHOLD = float(os.environ.get('TRACK_IOU_THRESHOLD', 0.3))
+    TRACK_IDLE_TIMEOUT = float(os.environ.get('TRACK_IDLE_TIMEOUT', 5.0))  # Seconds before state is dropped
+
+    # Write-behind persistence of punches
+    PERSIST_QUEUE_SIZE = int(os.environ.get('PERSIST_QUEUE_SIZE', 10000))
+    PERSIST_BATCH_SIZE = int(os.environ.get('PERSIST_BATCH_SIZE', 200))
+    PERSIST_FLUSH_INTERVAL = float(os.environ.get('PERSIST_FLUSH_INTERVAL', 1.0))  # Seconds
+
+    # Per-session binary event log, replayed into the database at session end or after a crash
+    EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', 'event_logs')
+    EVENT_LOG_SYNC_EVERY = int(os.environ.get('EVENT_LOG_SYNC_EVERY', 64))  # Records between fsyncs
+    EVENT_LOG_SYNC_INTERVAL = float(os.environ.get('EVENT_LOG_SYNC_INTERVAL', 0.5))  # Seconds
+
+    # Combination mining
+    COMBO_MAX_GAP = float(os.environ.get('COMBO_MAX_GAP', 1.5))  # Seconds between punches of one flurry
+    COMBO_WINDOW = float(os.environ.get('COMBO_WINDOW', 3.0))  # Longest combination, in seconds
+    COMBO_MIN_LENGTH = int(os.environ.get('COMBO_MIN_LENGTH', 2))
+    COMBO_MAX_LENGTH = int(os.environ.get('COMBO_MAX_LENGTH', 4))
+    COMBO_TOP_K = int(os.environ.get('COMBO_TOP_K', 10))
+
+    # Dashboard emission
+    SOCKET_TICK_MS = float(os.environ.get('SOCKET_TICK_MS', 100))  # Events are batched per tick
+    SOCKET_CLIENT_RATE = float(os.environ.get('SOCKET_CLIENT_RATE', 10))  # Messages per second per client
+    SOCKET_CLIENT_BACKLOG = int(os.environ.get('SOCKET_CLIENT_BACKLOG', 50))  # Batches kept for a slow client
+    SOCKET_CLIENT_MAX_PENDING = int(os.environ.get('SOCKET_CLIENT_MAX_PENDING', 20))  # Unacknowledged messages before a client counts as lagging
+    SOCKET_SESSION_HISTORY = int(os.environ.get('SOCKET_SESSION_HISTORY', 100))  # Batches kept per session for catch-up
+
+    # Concurrent sessions
+    SESSION_DEFAULT_PRIORITY = float(os.environ.get('SESSION_DEFAULT_PRIORITY', 1.0))
+    SESSION_CPU_BUDGET = float(os.environ.get('SESSION_CPU_BUDGET', 0))  # Seconds per second per session, 0 for no limit
+    SESSION_READY_QUEUE = int(os.environ.get('SESSION_READY_QUEUE', 8))  # Results waiting for a processing turn
+
+    # Multi-process pipeline: 'async' runs everything in this process, 'process'
+    # captures and infers in worker processes over shared memory
+    PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'async')
+    PIPELINE_INFERENCE_WORKERS = int(os.environ.get('PIPELINE_INFERENCE_WORKERS', 1))  # Cameras are split across them
+    PIPELINE_MAX_PERSONS = int(os.environ.get('PIPELINE_MAX_PERSONS', 8))  # Per frame, extra people are dropped
+    PIPELINE_RING_SLOTS = int(os.environ.get('PIPELINE_RING_SLOTS', 8))  # Frames and poses kept per camera
+    PIPELINE_START_TIMEOUT = float(os.environ.get('PIPELINE_START_TIMEOUT', 10))  # Seconds to wait for each camera's first frame
+
+    # API listings: keyset pages, or NDJSON streams
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 500))  # Rows per page when only a cursor is given
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 5000))
+    API_STREAM_BATCH = int(os.environ.get('API_STREAM_BATCH', 1000))  # Rows fetched per round trip when streaming
+
+    # Response cache for fighter and session reads
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))  # Entries
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))  # Seconds; ended sessions never expire
+    FIGHTER_CACHE_MISS_TTL = float(os.environ.get('FIGHTER_CACHE_MISS_TTL', 5))  # Seconds an unknown fighter id is remembered
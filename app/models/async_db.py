@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import threading
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.config import Config
+
+# Async drivers for the synchronous URLs Flask-SQLAlchemy is configured with
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(url):
+    """``url`` with its driver swapped for the asyncio one, e.g. ``sqlite+aiosqlite``"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if url.get_driver_name() in ('aiosqlite', 'asyncpg', 'aiomysql'):
+        return url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """
+    Asyncio-native access to the application database.
+
+    One ``AsyncEngine`` with a bounded connection pool (``DB_POOL_SIZE`` plus
+    ``DB_MAX_OVERFLOW``, pre-pinged and recycled) lives on a dedicated
+    event-loop thread, because pooled async connections belong to the loop
+    that opened them. Repository coroutines (``app.models.repository``) take
+    an ``AsyncSession`` as their first argument and run there: ``await
+    database.call(fn, ...)`` from any event loop, such as the session
+    manager's, or ``database.call_sync(fn, ...)`` from Flask request threads,
+    which wait without holding up anyone else's queries.
+    """
+
+    def __init__(self):
+        self.url = None
+        self.engine = None
+        self.sessions = None
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.url = Config.ASYNC_DATABASE_URL or async_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    def start(self):
+        """Start the database loop and engine; done on first use"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            if self.url is None:
+                self.url = Config.ASYNC_DATABASE_URL or async_database_url(Config.SQLALCHEMY_DATABASE_URI)
+            ready = threading.Event()
+            self.thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True, name='database')
+            self.thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        url = make_url(self.url)
+        options = {'pool_pre_ping': True}
+        if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+            options.update(pool_size=Config.DB_POOL_SIZE, max_overflow=Config.DB_MAX_OVERFLOW,
+                           pool_timeout=Config.DB_POOL_TIMEOUT, pool_recycle=Config.DB_POOL_RECYCLE)
+        self.engine = create_async_engine(url, **options)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        logging.info(f"Async database engine on {url.render_as_string(hide_password=True)}")
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    async def _run(self, fn, args, kwargs):
+        async with self.sessions() as session:
+            return await fn(session, *args, **kwargs)
+
+    def _submit(self, fn, args, kwargs):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._run(fn, args, kwargs), self.loop)
+
+    async def call(self, fn, *args, **kwargs):
+        """Await repository coroutine ``fn(session, *args, **kwargs)`` from any event loop"""
+        if asyncio.get_running_loop() is self.loop:
+            return await self._run(fn, args, kwargs)
+        return await asyncio.wrap_future(self._submit(fn, args, kwargs))
+
+    def call_sync(self, fn, *args, timeout=None, **kwargs):
+        """Run repository coroutine ``fn`` from a thread without an event loop, e.g. a Flask route"""
+        return self._submit(fn, args, kwargs).result(timeout)
+
+    def close(self, timeout=10.0):
+        """Dispose of the pool and stop the database loop"""
+        with self.lock:
+            if self.thread is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.engine.dispose(), self.loop).result(timeout)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+
+database = AsyncDatabase()
@@ -20,11 +20,12 @@ class Fighter(db.Model):
 class Session(db.Model):
     __tablename__ = 'sessions'
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     duration = db.Column(db.Integer, nullable=False)  # in seconds
     fighters = db.relationship('Fighter', secondary='session_fighters', back_populates='sessions')
     punches = db.relationship('PunchData', backref='session', cascade='all, delete-orphan')
     combinations = db.relationship('Combination', backref='session', cascade='all, delete-orphan')
+    punch_stats = db.relationship('PunchStat', backref='session', cascade='all, delete-orphan')
     videos = db.relationship('Video', backref='session', cascade='all, delete-orphan')
 
     def __repr__(self):
@@ -41,6 +42,8 @@ session_fighters = db.Table(
 
 class PunchData(db.Model):
     __tablename__ = 'punch_data'
+    # Per-fighter time-range scans within a session
+    __table_args__ = (db.Index('ix_punch_data_session_fighter_time', 'session_id', 'fighter_id', 'timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('sessions.id'), nullable=False, index=True)
     fighter_id = db.Column(db.Integer, db.ForeignKey('fighters.id'), nullable=False, index=True)
@@ -55,6 +58,23 @@ class PunchData(db.Model):
         return f"<Punch {self.punch_type} at {self.timestamp}s by Fighter {self.fighter_id}>"
 
 
+class PunchStat(db.Model):
+    """Rollup of a session's punches per fighter and punch type, kept current as punches are written"""
+    __tablename__ = 'punch_stats'
+    __table_args__ = (db.UniqueConstraint('session_id', 'fighter_id', 'punch_type'),)
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('sessions.id'), nullable=False, index=True)
+    fighter_id = db.Column(db.Integer, db.ForeignKey('fighters.id'), nullable=False)
+    punch_type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    speed_sum = db.Column(db.Float, nullable=False, default=0.0)
+    speed_max = db.Column(db.Float, nullable=False, default=0.0)
+    power_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<PunchStat {self.punch_type} x{self.count} by Fighter {self.fighter_id}>"
+
+
 class Combination(db.Model):
     __tablename__ = 'combinations'
     id = db.Column(db.Integer, primary_key=True)
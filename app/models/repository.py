@@ -0,0 +1,123 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import selectinload
+from app.models.models import Combination, Fighter, PunchStat, Session, session_fighters
+
+# Repository coroutines run through ``app.models.async_db.database`` with an
+# ``AsyncSession`` as their first argument. They return plain dicts and rows,
+# never ORM objects, so results can cross threads and event loops.
+
+PROFILE_FIELDS = ('id', 'name', 'weight_class', 'height', 'reach', 'stance')
+
+
+def fighter_profile(fighter):
+    return {field: getattr(fighter, field) for field in PROFILE_FIELDS}
+
+
+# Fighters
+
+async def list_fighters(session):
+    result = await session.scalars(select(Fighter).order_by(Fighter.id))
+    return [fighter_profile(fighter) for fighter in result]
+
+
+async def get_fighters(session, fighter_ids):
+    result = await session.scalars(select(Fighter).where(Fighter.id.in_(fighter_ids)))
+    return [fighter_profile(fighter) for fighter in result]
+
+
+async def create_fighter(session, data):
+    fighter = Fighter(
+        name=data['name'],
+        weight_class=data['weight_class'],
+        height=float(data['height']),
+        reach=float(data['reach']),
+        stance=data['stance']
+    )
+    session.add(fighter)
+    await session.commit()
+    return fighter_profile(fighter)
+
+
+async def update_fighter(session, fighter_id, data):
+    """Apply the fields present in ``data``; None if there is no such fighter"""
+    fighter = await session.get(Fighter, fighter_id)
+    if fighter is None:
+        return None
+    fighter.name = data.get('name', fighter.name)
+    fighter.weight_class = data.get('weight_class', fighter.weight_class)
+    fighter.height = float(data.get('height', fighter.height))
+    fighter.reach = float(data.get('reach', fighter.reach))
+    fighter.stance = data.get('stance', fighter.stance)
+    await session.commit()
+    return fighter_profile(fighter)
+
+
+# Sessions
+
+async def create_session(session, fighter_ids):
+    """Insert a session linked to ``fighter_ids`` and return its id"""
+    record = Session(date=datetime.utcnow(), duration=0)
+    session.add(record)
+    await session.flush()
+    if fighter_ids:
+        await session.execute(insert(session_fighters),
+                              [{'session_id': record.id, 'fighter_id': fighter_id} for fighter_id in fighter_ids])
+    await session.commit()
+    return record.id
+
+
+async def finish_session(session, session_id, duration):
+    """Record a session's duration; False if there is no such session"""
+    record = await session.get(Session, session_id)
+    if record is None:
+        return False
+    record.duration = duration
+    await session.commit()
+    return True
+
+
+async def delete_session(session, session_id):
+    """Remove a session that never got going, with its fighter links"""
+    await session.execute(delete(session_fighters).where(session_fighters.c.session_id == session_id))
+    await session.execute(delete(Session).where(Session.id == session_id))
+    await session.commit()
+
+
+async def get_session(session, session_id):
+    """A session with its fighters, or None"""
+    record = await session.scalar(
+        select(Session).options(selectinload(Session.fighters)).where(Session.id == session_id))
+    if record is None:
+        return None
+    return {
+        'id': record.id,
+        'date': record.date,
+        'duration': record.duration,
+        'fighters': [{'id': f.id, 'name': f.name} for f in record.fighters]
+    }
+
+
+async def get_session_summary(session, session_id):
+    """``get_session`` plus its ``punch_stats`` rollup rows and combinations, or None"""
+    summary = await get_session(session, session_id)
+    if summary is None:
+        return None
+    summary['punch_stats'] = (await session.execute(
+        select(PunchStat.fighter_id, PunchStat.punch_type, PunchStat.count, PunchStat.speed_sum,
+               PunchStat.speed_max, PunchStat.power_sum).where(PunchStat.session_id == session_id))).all()
+    summary['combinations'] = await list_combinations(session, session_id)
+    return summary
+
+
+# Combinations
+
+async def list_combinations(session, session_id):
+    """``fighter_id -> [{'sequence', 'frequency'}]`` for a session"""
+    combos = {}
+    result = await session.execute(
+        select(Combination.fighter_id, Combination.sequence, Combination.frequency)
+        .where(Combination.session_id == session_id))
+    for fighter_id, sequence, frequency in result:
+        combos.setdefault(fighter_id, []).append({'sequence': sequence, 'frequency': frequency})
+    return combos
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from app.models.models import db, Fighter
+from app.models import repository
+from app.models.async_db import database
+from app.services.fighter_cache import fighter_cache
+from app.services.response_cache import cached, response_cache
 import logging
 
 fighter_bp = Blueprint('fighter', __name__)
@@ -23,36 +26,23 @@ def validate_fighter_data(data):
     return None, True
 
 @fighter_bp.route('/fighters', methods=['GET'])
+@cached('fighters')
 def get_fighters():
     try:
-        fighters = Fighter.query.all()
-        return jsonify([
-            {
-                'id': f.id,
-                'name': f.name,
-                'weight_class': f.weight_class,
-                'height': f.height,
-                'reach': f.reach,
-                'stance': f.stance
-            } for f in fighters
-        ])
+        return jsonify(fighter_cache.all())
     except Exception as e:
         logging.error(f"Error fetching fighters: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
 @fighter_bp.route('/fighters/<int:fighter_id>', methods=['GET'])
+@cached('fighter:{fighter_id}')
 def get_fighter(fighter_id):
     try:
-        fighter = Fighter.query.get_or_404(fighter_id)
-        return jsonify({
-            'id': fighter.id,
-            'name': fighter.name,
-            'weight_class': fighter.weight_class,
-            'height': fighter.height,
-            'reach': fighter.reach,
-            'stance': fighter.stance
-        })
+        fighter = fighter_cache.get(fighter_id)
+        if fighter is None:
+            return jsonify({'error': 'Fighter not found'}), 404
+        return jsonify(fighter)
     except Exception as e:
         logging.error(f"Error fetching fighter {fighter_id}: {e}")
         return jsonify({'error': 'Fighter not found'}), 404
@@ -68,33 +58,20 @@ def create_fighter():
         return jsonify({'error': error_message}), 400
 
     try:
-        fighter = Fighter(
-            name=data['name'],
-            weight_class=data['weight_class'],
-            height=float(data['height']),
-            reach=float(data['reach']),
-            stance=data['stance']
-        )
-        db.session.add(fighter)
-        db.session.commit()
-
-        return jsonify({
-            'id': fighter.id,
-            'name': fighter.name,
-            'weight_class': fighter.weight_class,
-            'height': fighter.height,
-            'reach': fighter.reach,
-            'stance': fighter.stance
-        }), 201
+        fighter = database.call_sync(repository.create_fighter, data)
+        fighter_cache.put(fighter)
+        response_cache.invalidate('fighters')
+
+        return jsonify(fighter), 201
     except Exception as e:
-        db.session.rollback()
         logging.error(f"Error creating fighter: {e}")
         return jsonify({'error': 'Could not create fighter'}), 500
 
 
 @fighter_bp.route('/fighters/<int:fighter_id>', methods=['PUT'])
 def update_fighter(fighter_id):
-    fighter = Fighter.query.get_or_404(fighter_id)
+    if fighter_cache.get(fighter_id) is None:
+        return jsonify({'error': 'Fighter not found'}), 404
     data = request.get_json()
 
     # Validate data (partial update, so some fields might be missing)
@@ -103,23 +80,15 @@ def update_fighter(fighter_id):
         return jsonify({'error': error_message}), 400
 
     try:
-        fighter.name = data.get('name', fighter.name)
-        fighter.weight_class = data.get('weight_class', fighter.weight_class)
-        fighter.height = float(data.get('height', fighter.height))
-        fighter.reach = float(data.get('reach', fighter.reach))
-        fighter.stance = data.get('stance', fighter.stance)
-
-        db.session.commit()
-
-        return jsonify({
-            'id': fighter.id,
-            'name': fighter.name,
-            'weight_class': fighter.weight_class,
-            'height': fighter.height,
-            'reach': fighter.reach,
-            'stance': fighter.stance
-        })
+        fighter = database.call_sync(repository.update_fighter, fighter_id, data)
+        if fighter is None:
+            fighter_cache.invalidate(fighter_id)  # Removed from the database behind our back
+            return jsonify({'error': 'Fighter not found'}), 404
+        fighter_cache.put(fighter)  # Live events pick up the new name
+        # The fighter list, the fighter and the sessions showing the fighter's name
+        response_cache.invalidate('fighters', f"fighter:{fighter_id}")
+
+        return jsonify(fighter)
     except Exception as e:
-        db.session.rollback()
         logging.error(f"Error updating fighter {fighter_id}: {e}")
         return jsonify({'error': 'Could not update fighter'}), 500
\ No newline at end of file
@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify
-from app.models.models import db, Session, Fighter, PunchData, Combination
-from app.services.fight_analyzer import AsyncFightAnalyzer
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy.orm import selectinload
+from app.models import repository
+from app.models.async_db import database
+from app.models.models import db, Session, PunchData
+from app.services.fighter_cache import fighter_cache
+from app.services.punch_stats import rebuild_punch_stats, summarize_punch_stats
+from app.services.response_cache import add_cache_tags, cache_forever, cached, response_cache
+from app.services.session_manager import SessionManager
+from app.utils.pagination import paginated_response
 from datetime import datetime
-import asyncio
 import logging
 
 session_bp = Blueprint('session', __name__)
@@ -10,6 +16,15 @@ session_bp = Blueprint('session', __name__)
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _session_manager():
+    """The app's session manager, started on first use when ``main`` hasn't"""
+    manager = current_app.extensions.get('session_manager')
+    if manager is None:
+        manager = current_app.extensions.setdefault('session_manager',
+                                                    SessionManager(current_app._get_current_object()))
+        manager.start()
+    return manager
+
 def validate_session_data(data):
     """Validates session data."""
     if not isinstance(data.get('fighter_ids'), list) or not data.get('fighter_ids'):
@@ -28,17 +43,22 @@ def start_session():
     fighter_ids = data.get('fighter_ids')
 
     try:
-        fighters = Fighter.query.filter(Fighter.id.in_(fighter_ids)).all()
+        fighters = fighter_cache.get_many(fighter_ids)
         if len(fighters) != len(fighter_ids):
             return jsonify({'error': 'One or more fighter IDs are invalid'}), 400
 
-        analyzer = AsyncFightAnalyzer()  # Instantiate within the route
-        session_id = asyncio.run(analyzer.start_session(fighter_ids))
+        # Runs on the session manager's event loop, not a loop per request
+        session_id = _session_manager().start_session(fighter_ids)
         return jsonify({
             'session_id': session_id,
             'start_time': datetime.utcnow().isoformat(),
             'fighter_ids': fighter_ids
         }), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except RuntimeError as e:
+        logging.error(f"Error starting session: {e}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logging.error(f"Error starting session: {e}")
         return jsonify({'error': 'Could not start session'}), 500
@@ -47,8 +67,7 @@ def start_session():
 @session_bp.route('/sessions/<int:session_id>/end', methods=['POST'])
 def end_session(session_id):
     try:
-        analyzer = AsyncFightAnalyzer()  # Instantiate within the route
-        success = asyncio.run(analyzer.end_session(session_id))
+        success = _session_manager().end_session(session_id)
         if not success:
             return jsonify({'error': 'Session not found or already ended'}), 404
 
@@ -63,58 +82,101 @@ def end_session(session_id):
 
 
 @session_bp.route('/sessions/<int:session_id>', methods=['GET'])
+@cached('session:{session_id}')
 def get_session(session_id):
     try:
-        session = Session.query.get_or_404(session_id)
-
+        # One pooled async connection: session, fighters, rollup and combinations
+        session = database.call_sync(repository.get_session_summary, session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        add_cache_tags(*(f"fighter:{f['id']}" for f in session['fighters']))
+        if session['duration']:
+            cache_forever()  # Ended sessions don't change; late writes still invalidate them
+
+        # Totals come from the punch_stats rollup, never from the punch rows
+        stats = summarize_punch_stats(session['punch_stats'])
         punches_by_fighter = {}
-        for fighter in session.fighters:
-            punches = PunchData.query.filter_by(session_id=session_id, fighter_id=fighter.id).all()
-
-            punch_types = {}
-            for punch in punches:
-                punch_types[punch.punch_type] = punch_types.get(punch.punch_type, 0) + 1
-
-            punches_by_fighter[fighter.id] = {
-                'name': fighter.name,
-                'total_punches': len(punches),
-                'punch_types': punch_types
-            }
-
-        combinations = Combination.query.filter_by(session_id=session_id).all()
-        combo_stats = {}
-        for combo in combinations:
-            combo_stats.setdefault(combo.fighter_id, []).append({
-                'sequence': combo.sequence,
-                'frequency': combo.frequency
-            })
+        for fighter in session['fighters']:
+            punches_by_fighter[fighter['id']] = dict(
+                stats.get(fighter['id'], {'total_punches': 0, 'punch_types': {}, 'max_speed': 0.0,
+                                          'total_power': 0.0, 'avg_speed': 0.0}),
+                name=fighter['name'])
 
         return jsonify({
-            'id': session.id,
-            'date': session.date.isoformat(),
-            'duration': session.duration,
-            'fighters': [{'id': f.id, 'name': f.name} for f in session.fighters],
+            'id': session['id'],
+            'date': session['date'].isoformat(),
+            'duration': session['duration'],
+            'fighters': session['fighters'],
             'punch_stats': punches_by_fighter,
-            'combination_stats': combo_stats
+            'combination_stats': session['combinations']
         })
     except Exception as e:
         logging.error(f"Error getting session {session_id}: {e}")
         return jsonify({'error': 'Could not retrieve session'}), 500
 
 
+@session_bp.route('/sessions/<int:session_id>/stats/rebuild', methods=['POST'])
+def rebuild_session_stats(session_id):
+    """Recompute a finished session's punch_stats rollup from its punch rows"""
+    manager = current_app.extensions.get('session_manager')
+    if manager is not None and manager.get_analyzer(session_id) is not None:
+        return jsonify({'error': 'Session is still running'}), 409
+    try:
+        Session.query.get_or_404(session_id)
+        rows = rebuild_punch_stats(session_id)
+        response_cache.invalidate(f"session:{session_id}")
+        return jsonify({'session_id': session_id, 'rows': rows})
+    except Exception as e:
+        logging.error(f"Error rebuilding stats for session {session_id}: {e}")
+        return jsonify({'error': 'Could not rebuild session stats'}), 500
+
+
+def _time_range(column, convert):
+    """Filters for the ``start``/``end`` query arguments on ``column``"""
+    filters = []
+    for name, compare in (('start', column.__ge__), ('end', column.__le__)):
+        value = request.args.get(name)
+        if value is not None:
+            filters.append(compare(convert(value)))
+    return filters
+
+
+def _session_json(s):
+    return {
+        'id': s.id,
+        'date': s.date.isoformat(),
+        'duration': s.duration,
+        'fighters': [{'id': f.id, 'name': f.name} for f in s.fighters]
+    }
+
+
+def _punch_json(p):
+    return {
+        'id': p.id,
+        'fighter_id': p.fighter_id,
+        'punch_type': p.punch_type,
+        'timestamp': p.timestamp,
+        'speed': p.speed,
+        'x_position': p.x_position,
+        'y_position': p.y_position
+    }
+
+
 @session_bp.route('/sessions', methods=['GET'])
 def get_sessions():
+    """
+    Sessions by id, a keyset page at a time (``after``, ``limit``) or as
+    NDJSON (``format=ndjson``); ``start``/``end`` bound the date (ISO 8601).
+    """
+    try:
+        filters = _time_range(Session.date, datetime.fromisoformat)
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 dates'}), 400
+
     try:
-        sessions = Session.query.all()
-        return jsonify([
-            {
-                'id': s.id,
-                'date': s.date.isoformat(),
-                'duration': s.duration,
-                'fighters': [{'id': f.id, 'name': f.name} for f in s.fighters]
-            }
-            for s in sessions
-        ])
+        # Fighters of the whole page come in one extra query
+        statement = db.select(Session).options(selectinload(Session.fighters)).where(*filters)
+        return paginated_response(statement, Session.id, _session_json, scalars=True)
     except Exception as e:
         logging.error(f"Error getting all sessions: {e}")
         return jsonify({'error': 'Could not retrieve sessions'}), 500
@@ -122,26 +184,25 @@ def get_sessions():
 
 @session_bp.route('/sessions/<int:session_id>/punches', methods=['GET'])
 def get_session_punches(session_id):
+    """
+    Punches by id, a keyset page at a time (``after``, ``limit``) or as
+    NDJSON (``format=ndjson``); ``fighter_id`` and the ``start``/``end``
+    timestamps narrow them down.
+    """
     fighter_id = request.args.get('fighter_id', type=int)
+    try:
+        filters = _time_range(PunchData.timestamp, float)
+    except ValueError:
+        return jsonify({'error': 'start and end must be timestamps'}), 400
 
     try:
-        query = PunchData.query.filter_by(session_id=session_id)
+        punches = PunchData.__table__
+        statement = db.select(punches.c.id, punches.c.fighter_id, punches.c.punch_type, punches.c.timestamp,
+                              punches.c.speed, punches.c.x_position, punches.c.y_position).where(
+            punches.c.session_id == session_id, *filters)
         if fighter_id:
-            query = query.filter_by(fighter_id=fighter_id)
-
-        punches = query.all()
-
-        return jsonify([
-            {
-                'id': p.id,
-                'fighter_id': p.fighter_id,
-                'punch_type': p.punch_type,
-                'timestamp': p.timestamp,
-                'speed': p.speed,
-                'x_position': p.x_position,
-                'y_position': p.y_position
-            } for p in punches
-        ])
+            statement = statement.where(punches.c.fighter_id == fighter_id)
+        return paginated_response(statement, punches.c.id, _punch_json)
     except Exception as e:
         logging.error(f"Error getting punches for session {session_id}: {e}")
-        return jsonify({'error': 'Could not retrieve punches'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Could not retrieve punches'}), 500
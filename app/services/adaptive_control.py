@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import deque
+from app.config import Config
+
+class AdaptiveLatencyController:
+    """
+    Trades frame rate and input size for bounded end-to-end latency.
+
+    ``ladder`` is a list of ``(skip_frames, imgsz)`` levels from best quality
+    to cheapest; an ``imgsz`` of None keeps the model's own input size. The
+    controller follows a smoothed latency (capture to inference result) and
+    the inference queue depth. It steps down the ladder when either exceeds
+    its target and climbs back one level at a time once latency has stayed
+    well under target for ``upgrade_after`` results. Every change is logged and
+    kept in ``changes``.
+    """
+
+    def __init__(self, ladder=None, target_latency=None, max_queue_depth=None,
+                 upgrade_after=30, cooldown=1.0, smoothing=0.2, name=''):
+        self.ladder = ladder or Config.ADAPTIVE_LADDER
+        self.target_latency = target_latency or Config.ADAPTIVE_TARGET_LATENCY_MS / 1000.0
+        self.max_queue_depth = max_queue_depth or Config.ADAPTIVE_MAX_QUEUE_DEPTH
+        self.upgrade_after = upgrade_after
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.name = name
+        self.level = 0
+        self.latency = None  # Exponentially smoothed, in seconds
+        self.calm_results = 0
+        self.last_change = 0.0
+        self.changes = deque(maxlen=100)
+
+    @property
+    def skip_frames(self):
+        return self.ladder[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.ladder[self.level][1]
+
+    def observe(self, latency, queue_depth=0):
+        """Feed one result's latency; returns True when the level changed"""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        now = time.time()
+        if now - self.last_change < self.cooldown:
+            return False
+
+        overloaded = self.latency > self.target_latency or queue_depth > self.max_queue_depth
+        if overloaded:
+            self.calm_results = 0
+            if self.level < len(self.ladder) - 1:
+                return self._change(self.level + 1, 'overloaded', queue_depth, now)
+            return False
+
+        if self.latency < 0.6 * self.target_latency and queue_depth == 0:
+            self.calm_results += 1
+            if self.calm_results >= self.upgrade_after and self.level > 0:
+                return self._change(self.level - 1, 'headroom', queue_depth, now)
+        else:
+            self.calm_results = 0
+        return False
+
+    def _change(self, level, reason, queue_depth, now):
+        previous = self.level
+        self.level = level
+        self.calm_results = 0
+        self.last_change = now
+        change = {
+            'time': now,
+            'from': self.ladder[previous],
+            'to': self.ladder[level],
+            'reason': reason,
+            'latency_ms': round(self.latency * 1000, 1),
+            'queue_depth': queue_depth
+        }
+        self.changes.append(change)
+        logging.info(f"Adaptive control {self.name}: level {previous} -> {level} "
+                     f"(skip, imgsz) {change['from']} -> {change['to']}, {reason}, "
+                     f"latency {change['latency_ms']} ms, queue {queue_depth}")
+        return True
+
+    def status(self):
+        return {
+            'adaptive_level': self.level,
+            'skip_frames': self.skip_frames,
+            'imgsz': self.imgsz,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'adaptive_changes': len(self.changes)
+        }
@@ -1,78 +1,240 @@
 import cv2
 import asyncio
+import threading
+import heapq
+import logging
 import time
-from app.services.punch_detector import PunchDetector
-from app.utils.pose_utils import extract_keypoints, initialize_pose_model
+from collections import deque
+from app.config import Config
+from app.services.adaptive_control import AdaptiveLatencyController
+from app.services.inference_gating import MotionGate, RoiCropper
+from app.services.inference_worker import BatchInferenceWorker
+from app.utils.frame_buffer import FrameRingBuffer
+from app.utils.pose_utils import extract_keypoints
 
 class AsyncVideoGet:
-    def __init__(self, src=0):
+    def __init__(self, src=0, buffer_slots=8):
         self.src = src
         self.stream = None
         self.stopped = True
-        self.frame = None
+        self.buffer_slots = buffer_slots
+        self.buffer = None
+        self.thread = None
+        self.loop = None
+        self.frame_event = asyncio.Event()
 
     async def start(self):
         self.stream = cv2.VideoCapture(self.src, cv2.CAP_DSHOW)
-        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, 480)
-        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
-        self.stream.set(cv2.CAP_PROP_FPS, 15)
+        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAPTURE_WIDTH)
+        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAPTURE_HEIGHT)
+        self.stream.set(cv2.CAP_PROP_FPS, Config.CAPTURE_FPS)
         self.stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Size the frame pool from the first frame the camera actually delivers
+        ret, frame = await asyncio.to_thread(self.stream.read)
+        if not ret:
+            self.stream.release()
+            raise RuntimeError(f"Camera {self.src} returned no frames")
+        self.buffer = FrameRingBuffer(frame.shape, slots=self.buffer_slots, dtype=frame.dtype)
+        self.buffer.next_slot()[...] = frame
+        self.buffer.publish(time.time())
+
         self.stopped = False
-        await self.get()  # Start the frame grabbing
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+
+    def _capture_loop(self):
+        """Decode frames straight into the ring buffer on a dedicated thread"""
+        while not self.stopped:
+            slot = self.buffer.next_slot()
+            ret, frame = self.stream.read(slot)
+            if not ret:
+                time.sleep(0.01)  # Camera hiccup, don't spin
+                continue
+            if frame.ctypes.data != slot.ctypes.data:
+                if frame.shape != slot.shape:
+                    continue  # Resolution changed under us, drop the frame
+                slot[...] = frame
+            self.buffer.publish(time.time())
+            try:
+                self.loop.call_soon_threadsafe(self.frame_event.set)
+            except RuntimeError:
+                break  # Event loop is gone, nobody is left to read frames
+
+    @property
+    def frame(self):
+        """Zero-copy view of the most recent frame"""
+        latest = self.read()
+        return latest[2] if latest else None
 
-    async def get(self):
+    def read(self):
+        """Return ``(seq, timestamp, frame_view)`` for the most recent frame, or None"""
+        if self.buffer is None:
+            return None
+        return self.buffer.latest()
+
+    async def next_frame(self, after_seq, timeout=None):
+        """Wait for a frame newer than ``after_seq`` without polling"""
         while not self.stopped:
-            ret, frame = self.stream.read()
-            if ret:
-                self.frame = frame
-            await asyncio.sleep(0.001)  # Yield to the event loop
+            self.frame_event.clear()
+            latest = self.read()
+            if latest is not None and latest[0] > after_seq:
+                return latest
+            try:
+                await asyncio.wait_for(self.frame_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return None
 
     async def stop(self):
         self.stopped = True
+        self.frame_event.set()  # Wake any waiter so it can observe the stop
+        if self.thread:
+            await asyncio.to_thread(self.thread.join, 1.0)
+            self.thread = None
         if self.stream:
             self.stream.release()
 
 class AsyncInferenceProcessor:
-    def __init__(self, video_get, model, skip_frames=1):
+    def __init__(self, video_get, inference, skip_frames=1, max_pending=8, max_in_flight=None,
+                 motion_gate=None, roi=None, adaptive=None):
         self.video_get = video_get
         self.stopped = False
         self.skip_frames = skip_frames
         self.frame_count = 0
-        self.model = model
+        self.last_seq = 0
+        self.inference = inference
         self.latest_result = None
+        # Results waiting for the detector, oldest first, as
+        # (frame_id, timestamp, frame, pose) with frame_id the capture seq
+        self.pending = deque()
+        self.max_pending = max_pending
+        self.result_event = asyncio.Event()
+        self.dropped_results = 0
+        self.skipped_frames = 0  # Captured frames inference never saw
+        self.torn_results = 0  # Frames overwritten by capture while the model read them
+        # Frames submitted to the batch worker, completed strictly in order
+        self.in_flight = asyncio.Queue(maxsize=max_in_flight or Config.INFERENCE_MAX_IN_FLIGHT)
+        self.tasks = []
+        motion_gate = Config.MOTION_GATE if motion_gate is None else motion_gate
+        roi = Config.ROI_MODE if roi is None else roi
+        self.motion_gate = MotionGate() if motion_gate else None
+        self.roi = RoiCropper() if roi else None
+        self.gating_stats = {'gated': 0, 'processed': 0, 'roi': 0, 'full': 0}
+        adaptive = Config.ADAPTIVE_CONTROL if adaptive is None else adaptive
+        self.controller = AdaptiveLatencyController(name=f"camera {video_get.src}") if adaptive else None
+        if self.controller:
+            self.skip_frames = self.controller.skip_frames
 
     async def start(self):
-        asyncio.create_task(self.process())
+        self.tasks = [asyncio.create_task(self.process()),
+                      asyncio.create_task(self.collect())]
+        return self
 
     async def process(self):
         while not self.stopped:
-            if self.video_get.frame is not None:
-                self.frame_count += 1
-                if self.frame_count % self.skip_frames == 0:
-                    results = self.model(self.video_get.frame, verbose=False)[0]
-                    self.latest_result = (time.time(), self.video_get.frame.copy(), results)
-            await asyncio.sleep(0.001)
+            latest = await self.video_get.next_frame(self.last_seq, timeout=0.5)
+            if latest is None:
+                continue
+            seq, timestamp, frame = latest
+            if self.last_seq:
+                self.skipped_frames += seq - self.last_seq - 1
+            self.last_seq = seq
+            self.frame_count += 1
+            if self.frame_count % self.skip_frames != 0:
+                continue
+            if self.motion_gate and not self.motion_gate.should_infer(frame):
+                self.gating_stats['gated'] += 1
+                continue
+
+            crop, offset = self.roi.crop(frame) if self.roi else (frame, (0, 0))
+            self.gating_stats['processed'] += 1
+            self.gating_stats['roi' if crop is not frame else 'full'] += 1
+            # Blocks once max_in_flight frames are queued, so a slow model
+            # makes us skip capture frames instead of piling up work
+            imgsz = self.controller.imgsz if self.controller else None
+            await self.in_flight.put((seq, timestamp, frame, offset, self.inference.submit(crop, imgsz)))
+
+    async def collect(self):
+        while True:
+            seq, timestamp, frame, offset, future = await self.in_flight.get()
+            try:
+                results = await future
+            except asyncio.CancelledError:
+                if self.stopped:
+                    return
+                continue
+            except Exception:
+                continue  # Already logged by the inference worker
+            if not self.video_get.buffer.valid(seq):
+                # The model read a zero-copy view of a slot capture has since
+                # reused: the keypoints may belong to a newer or torn frame
+                self.torn_results += 1
+                continue
+            if self.controller:
+                queue_depth = self.inference.queue_depth() + self.in_flight.qsize()
+                if self.controller.observe(time.time() - timestamp, queue_depth):
+                    self.skip_frames = self.controller.skip_frames
+            pose = extract_keypoints(results, offset, timestamp, self.video_get.src, seq)
+            if self.roi:
+                self.roi.update(pose.keypoints, frame.shape)
+            self._push_result((seq, timestamp, frame, pose))
+
+    def _push_result(self, result):
+        self.latest_result = result
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped_results += 1
+        self.pending.append(result)
+        self.result_event.set()
+
+    async def next_result(self, timeout=None):
+        """Pop the oldest result the detector has not consumed yet"""
+        while not self.pending:
+            self.result_event.clear()
+            try:
+                await asyncio.wait_for(self.result_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            if self.stopped:
+                return None
+        return self.pending.popleft()
 
     def get_latest_result(self):
         return self.latest_result
 
     async def stop(self):
         self.stopped = True
+        self.result_event.set()
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        while not self.in_flight.empty():
+            *_, future = self.in_flight.get_nowait()
+            future.cancel()
 
 class AsyncSingleCameraRunner:
-    def __init__(self, camera_id=0):
+    def __init__(self, camera_id=0, inference=None, max_in_flight=None):
         self.camera_id = camera_id
+        self.max_in_flight = max_in_flight
         self.video_get = AsyncVideoGet(camera_id)
         self.processor = None
-        self.model, _ = initialize_pose_model()  # Initialize model once
-        self.detector = PunchDetector()
+        # Share the caller's inference worker when given, otherwise own one
+        self.owns_inference = inference is None
+        self.inference = inference or BatchInferenceWorker()  # Model comes from the shared registry
         self.running = False
+        self.last_frame_id = 0
+        self.stats = {'processed': 0, 'dropped': 0, 'duplicates': 0,
+                      'skipped_frames': 0, 'torn_frames': 0, 'deadline_misses': 0}
 
     async def start(self):
         self.running = True
         try:
+            await self.inference.start()
             await self.video_get.start()
-            self.processor = AsyncInferenceProcessor(self.video_get, self.model).start()
+            self.processor = await AsyncInferenceProcessor(self.video_get, self.inference,
+                                                           max_in_flight=self.max_in_flight).start()
         except Exception as e:
             print(f"Error starting camera {self.camera_id}: {e}")
             await self.stop()  # Ensure resources are cleaned up
@@ -82,15 +244,164 @@ class AsyncSingleCameraRunner:
     async def stop(self):
         self.running = False
         if self.processor:
-            self.processor.stopped = True  # Signal processor to stop
+            await self.processor.stop()  # Signal processor to stop
         if self.video_get:
             await self.video_get.stop()
+        if self.owns_inference:
+            await self.inference.stop()
+
+    async def next_result(self, timeout=None):
+        """
+        Wait until ``timeout`` for the next unseen inference result.
+
+        Each result is handed out exactly once, in frame order, as
+        ``(frame_id, timestamp, frame, pose)``. Results that never reach
+        the caller are counted as dropped, repeats as duplicates.
+        """
+        if not self.processor:
+            return None
+        while True:
+            result = await self.processor.next_result(timeout)
+            self.stats['dropped'] = self.processor.dropped_results
+            self.stats['skipped_frames'] = self.processor.skipped_frames
+            self.stats['torn_frames'] = self.processor.torn_results
+            if result is None:
+                if self.running:
+                    self.stats['deadline_misses'] += 1
+                return None
+            frame_id = result[0]
+            if frame_id <= self.last_frame_id:
+                self.stats['duplicates'] += 1
+                continue
+            self.last_frame_id = frame_id
+            self.stats['processed'] += 1
+            return result
 
     def get_latest_result(self):
         if self.processor:
             result = self.processor.get_latest_result()
             if result:
-                timestamp, frame, results = result
-                keypoints = extract_keypoints(results) if results else []
-                return timestamp, frame, keypoints
-        return None
\ No newline at end of file
+                frame_id, timestamp, frame, pose = result
+                return timestamp, frame, pose
+        return None
+
+class AsyncMultiCameraRunner:
+    """
+    Runs one capture pipeline per camera on a shared inference worker and
+    merges their results onto a single timeline ordered by capture time.
+
+    A result is released once every running camera has delivered something at
+    least as recent, or after ``merge_window`` seconds so a stalled camera
+    cannot hold the others back. ``max_in_flight`` caps each camera's frames
+    queued on the inference worker, which is how sessions sharing one worker
+    get their share of it.
+    """
+
+    def __init__(self, camera_ids=None, inference=None, merge_window=None, max_in_flight=None):
+        self.camera_ids = list(camera_ids or Config.CAMERA_IDS or [0])
+        self.owns_inference = inference is None
+        self.inference = inference or BatchInferenceWorker()  # Model comes from the shared registry
+        self.runners = {camera_id: AsyncSingleCameraRunner(camera_id, inference=self.inference,
+                                                           max_in_flight=max_in_flight)
+                        for camera_id in self.camera_ids}
+        self.merge_window = merge_window if merge_window is not None else Config.CAMERA_MERGE_WINDOW_MS / 1000.0
+        self.timeline = []  # Heap of (timestamp, camera_id, frame_id, frame, pose)
+        self.last_timestamp = {}
+        self.result_event = asyncio.Event()
+        self.pump_tasks = {}
+        self.running = False
+        self.stats = {'released': 0, 'late_releases': 0, 'deadline_misses': 0}
+
+    async def start(self):
+        self.running = True
+        await self.inference.start()
+        started = await asyncio.gather(*(runner.start() for runner in self.runners.values()))
+        for (camera_id, runner), ok in zip(self.runners.items(), started):
+            if ok:
+                self.pump_tasks[camera_id] = asyncio.create_task(self._pump(camera_id, runner))
+            else:
+                logging.warning(f"Camera {camera_id} failed to start")
+        if not self.pump_tasks:
+            await self.stop()
+            return False
+        return True
+
+    async def stop(self):
+        self.running = False
+        for task in self.pump_tasks.values():
+            task.cancel()
+        self.pump_tasks = {}
+        await asyncio.gather(*(runner.stop() for runner in self.runners.values()))
+        if self.owns_inference:
+            await self.inference.stop()
+        self.result_event.set()
+
+    async def _pump(self, camera_id, runner):
+        """Move one camera's results onto the shared timeline"""
+        while runner.running:
+            result = await runner.next_result()
+            if result is None:
+                continue
+            frame_id, timestamp, frame, pose = result
+            self.last_timestamp[camera_id] = timestamp
+            heapq.heappush(self.timeline, (timestamp, camera_id, frame_id, frame, pose))
+            self.result_event.set()
+
+    def _pop_ready(self):
+        """Return ``(result, wait)``: a releasable result, or how long until the head is due"""
+        if not self.timeline:
+            return None, None
+        head_time = self.timeline[0][0]
+        live = [self.last_timestamp.get(camera_id, 0.0) for camera_id in self.pump_tasks]
+        watermark = min(live) if live else float('inf')
+        overdue = time.time() - (head_time + self.merge_window)
+        if head_time <= watermark or overdue >= 0:
+            if head_time > watermark:
+                self.stats['late_releases'] += 1
+            self.stats['released'] += 1
+            timestamp, camera_id, frame_id, frame, pose = heapq.heappop(self.timeline)
+            return (camera_id, frame_id, timestamp, frame, pose), None
+        return None, -overdue
+
+    async def next_result(self, timeout=None):
+        """
+        Wait until ``timeout`` for the next result on the merged timeline, as
+        ``(camera_id, frame_id, timestamp, frame, pose)`` with ``pose`` a PoseFrame.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.running:
+            self.result_event.clear()
+            result, wait = self._pop_ready()
+            if result is not None:
+                return result
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                self.stats['deadline_misses'] += 1
+                return None
+            if wait is not None:
+                remaining = wait if remaining is None else min(wait, remaining)
+            try:
+                await asyncio.wait_for(self.result_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    def health(self):
+        """Per-camera status: capture thread, last frame age and frame counters"""
+        now = time.time()
+        report = {}
+        for camera_id, runner in self.runners.items():
+            video_get = runner.video_get
+            latest = video_get.read()
+            report[camera_id] = {
+                'running': runner.running and camera_id in self.pump_tasks,
+                'capturing': video_get.thread is not None and video_get.thread.is_alive(),
+                'frames_captured': latest[0] if latest else 0,
+                'last_frame_age': now - latest[1] if latest else None,
+                **runner.stats,
+                **(runner.processor.gating_stats if runner.processor else {}),
+                **(runner.processor.controller.status()
+                   if runner.processor and runner.processor.controller else {})
+            }
+        return report
@@ -0,0 +1,115 @@
+from collections import deque
+from app.config import Config
+
+class _Node:
+    """Trie node for one punch sequence, reached by walking it newest punch first."""
+    __slots__ = ('children', 'count', 'sequence')
+
+    def __init__(self, sequence):
+        self.children = {}
+        self.count = 0
+        self.sequence = sequence
+
+
+class _FighterMiner:
+    __slots__ = ('recent', 'root', 'leaders', 'floor')
+
+    def __init__(self):
+        self.recent = deque()  # (punch_type, timestamp) of the current flurry, oldest first
+        self.root = _Node(())
+        self.leaders = {}  # sequence -> count of the current top-K
+        self.floor = 0  # Never above the smallest leader count
+
+
+class CombinationMiner:
+    """
+    Streaming combination mining over sliding time windows.
+
+    Each fighter keeps the punches of their current flurry: consecutive
+    punches at most ``max_gap`` seconds apart, spanning at most ``window``
+    seconds and ``max_length`` punches. Every new punch ends one occurrence
+    of each suffix of the flurry, so ``add`` walks those suffixes in a trie
+    keyed newest punch first and bumps one counter per step: O(sequence
+    length) per punch. Sub-patterns of longer flurries are counted too. The
+    top ``top_k`` sequences per fighter are maintained as counts change, so
+    ``top`` never rescans history.
+    """
+
+    def __init__(self, max_gap=None, window=None, min_length=None, max_length=None, top_k=None):
+        self.max_gap = max_gap or Config.COMBO_MAX_GAP
+        self.window = window or Config.COMBO_WINDOW
+        self.min_length = min_length or Config.COMBO_MIN_LENGTH
+        self.max_length = max_length or Config.COMBO_MAX_LENGTH
+        self.top_k = top_k or Config.COMBO_TOP_K
+        self.fighters = {}
+
+    def add(self, fighter_id, punch_type, timestamp):
+        """
+        Feed one punch; returns the ``(punch_types, start_time, end_time)``
+        occurrences it completes, shortest first.
+        """
+        miner = self.fighters.get(fighter_id)
+        if miner is None:
+            miner = self.fighters[fighter_id] = _FighterMiner()
+
+        recent = miner.recent
+        if recent and timestamp - recent[-1][1] > self.max_gap:
+            recent.clear()
+        recent.append((punch_type, timestamp))
+        while len(recent) > self.max_length or timestamp - recent[0][1] > self.window:
+            recent.popleft()
+
+        occurrences = []
+        node = miner.root
+        for length in range(1, len(recent) + 1):
+            previous_type, start_time = recent[-length]
+            child = node.children.get(previous_type)
+            if child is None:
+                child = node.children[previous_type] = _Node((previous_type,) + node.sequence)
+            node = child
+            if length < self.min_length:
+                continue
+            node.count += 1
+            self._update_leaders(miner, node)
+            occurrences.append((node.sequence, start_time, timestamp))
+        return occurrences
+
+    def _update_leaders(self, miner, node):
+        # Counts only ever grow by one, so a sequence can only enter the top-K
+        # by overtaking its current minimum; the cached floor skips the scan
+        # for the common case of a count that cannot
+        leaders = miner.leaders
+        if node.sequence in leaders or len(leaders) < self.top_k:
+            leaders[node.sequence] = node.count
+            return
+        if node.count <= miner.floor:
+            return
+        weakest = min(leaders, key=leaders.get)
+        miner.floor = leaders[weakest]
+        if node.count > miner.floor:
+            del leaders[weakest]
+            leaders[node.sequence] = node.count
+            miner.floor = min(leaders.values())
+
+    def top(self, fighter_id, k=None):
+        """``[(sequence, count)]`` of a fighter's most frequent combinations, most frequent first"""
+        miner = self.fighters.get(fighter_id)
+        if miner is None:
+            return []
+        ranked = sorted(miner.leaders.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [("-".join(sequence), count) for sequence, count in ranked[:k or self.top_k]]
+
+    def count(self, fighter_id, punch_types):
+        """Occurrences of one sequence so far"""
+        miner = self.fighters.get(fighter_id)
+        node = miner.root if miner else None
+        for punch_type in reversed(punch_types):
+            if node is None:
+                return 0
+            node = node.children.get(punch_type)
+        return node.count if node is not None else 0
+
+    def end_flurries(self):
+        """Forget in-progress flurries, keeping the counts"""
+        for miner in self.fighters.values():
+            miner.recent.clear()
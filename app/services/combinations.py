@@ -0,0 +1,89 @@
+import threading
+from sqlalchemy import bindparam
+from app.models.models import db, Combination
+from app.services.response_cache import response_cache
+
+class CombinationAggregator:
+    """
+    In-memory combination counters, written to ``combinations`` in batches.
+
+    ``record`` only bumps the ``(session, fighter, sequence)`` counter and its
+    start/end times. ``flush`` writes every counter that changed since the
+    last flush as one upsert: a single SELECT for the rows that already
+    exist, one executemany UPDATE and one executemany INSERT, in a single
+    transaction. Rows are written with absolute totals, so a failed flush is
+    simply retried by the next one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (session_id, fighter_id, sequence) -> [frequency, start_time, end_time]
+        self.dirty = set()
+        self.stats = {'recorded': 0, 'flushes': 0, 'updated': 0, 'inserted': 0}
+
+    def record(self, session_id, fighter_id, sequence, start_time, end_time):
+        key = (session_id, fighter_id, sequence)
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                self.counters[key] = [1, start_time, end_time]
+            else:
+                counter[0] += 1
+                counter[1] = min(counter[1], start_time)
+                counter[2] = max(counter[2], end_time)
+            self.dirty.add(key)
+            self.stats['recorded'] += 1
+
+    def flush(self):
+        """Upsert every changed counter; must run inside an application context"""
+        with self.lock:
+            if not self.dirty:
+                return 0
+            pending = {key: tuple(self.counters[key]) for key in self.dirty}
+            self.dirty.clear()
+
+        table = Combination.__table__
+        try:
+            with db.engine.begin() as connection:
+                existing = {
+                    (row.session_id, row.fighter_id, row.sequence): row.id
+                    for row in connection.execute(
+                        db.select(table.c.id, table.c.session_id, table.c.fighter_id, table.c.sequence)
+                        .where(table.c.session_id.in_(list({key[0] for key in pending}))))
+                }
+                updates, inserts = [], []
+                for (session_id, fighter_id, sequence), (frequency, start, end) in pending.items():
+                    row_id = existing.get((session_id, fighter_id, sequence))
+                    if row_id is not None:
+                        updates.append({'row_id': row_id, 'new_frequency': frequency,
+                                        'new_start': start, 'new_end': end})
+                    else:
+                        inserts.append({'session_id': session_id, 'fighter_id': fighter_id, 'sequence': sequence,
+                                        'start_time': start, 'end_time': end, 'frequency': frequency})
+                if updates:
+                    connection.execute(
+                        table.update().where(table.c.id == bindparam('row_id')).values(
+                            frequency=bindparam('new_frequency'),
+                            start_time=bindparam('new_start'),
+                            end_time=bindparam('new_end')),
+                        updates)
+                if inserts:
+                    connection.execute(table.insert(), inserts)
+        except Exception:
+            with self.lock:
+                # Written again by the next flush, unless the session was discarded meanwhile
+                self.dirty.update(key for key in pending if key in self.counters)
+            raise
+
+        response_cache.invalidate(*{f"session:{key[0]}" for key in pending})
+        self.stats['flushes'] += 1
+        self.stats['updated'] += len(updates)
+        self.stats['inserted'] += len(inserts)
+        return len(pending)
+
+    def discard(self, session_id):
+        """Forget a finished session's counters"""
+        with self.lock:
+            for key in [key for key in self.counters if key[0] == session_id]:
+                del self.counters[key]
+                self.dirty.discard(key)
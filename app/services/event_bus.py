@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+
+PUNCH = 'punch'
+COMBINATION = 'combination'
+SESSION = 'session'  # Session lifecycle: {'session_id', 'status': 'started' | 'ended'}
+
+
+class Subscription:
+    """
+    A subscriber's bounded inbox.
+
+    ``publish`` never blocks on a slow subscriber: once ``maxsize`` events are
+    waiting the oldest is dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, bus, topics, maxsize):
+        self.bus = bus
+        self.topics = set(topics) if topics else None  # None receives every topic
+        self.events = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def _deliver(self, topic, event):
+        with self.condition:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append((topic, event))
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Next ``(topic, event)``, or None if nothing arrived within ``timeout``"""
+        with self.condition:
+            if not self.events and not self.condition.wait_for(lambda: self.events, timeout):
+                return None
+            return self.events.popleft()
+
+    def get_all(self, timeout=None):
+        """Every waiting ``(topic, event)``, waiting up to ``timeout`` for the first"""
+        with self.condition:
+            if not self.events:
+                self.condition.wait_for(lambda: self.events, timeout)
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for live analysis events.
+
+    The analyzer publishes punches and combinations the moment they are
+    detected; consumers such as the Socket.IO layer subscribe and drain their
+    own inbox on their own thread, so publishing costs a few appends and
+    nothing on the live path touches the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []
+        self.published = 0
+
+    def subscribe(self, topics=None, maxsize=1000):
+        subscription = Subscription(self, topics, maxsize)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, topic, event):
+        self.published += 1
+        for subscription in self.subscriptions:  # Copy-on-write, safe without the lock
+            if subscription.topics is None or topic in subscription.topics:
+                subscription._deliver(topic, event)
+
+
+event_bus = EventBus()
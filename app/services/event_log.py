@@ -0,0 +1,234 @@
+import glob
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import Counter
+from datetime import timezone
+from app.config import Config
+from app.models.models import db, Session, PunchData, Combination
+from app.services.punch_stats import apply_punch_stats
+from app.services.response_cache import response_cache
+from app.services.punch_detector import PUNCH_CLASSES
+
+# Punch types as 1-based codes; 0 stands for a type we don't know
+PUNCH_TYPES = [f"{punch_class} {side}" for punch_class in PUNCH_CLASSES for side in ("Left", "Right")]
+PUNCH_CODES = {punch_type: code for code, punch_type in enumerate(PUNCH_TYPES, start=1)}
+
+MAGIC = b'BXEV'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxI')  # magic, version, session_id
+MAX_SEQUENCE = 12
+# kind, punch code, sequence length, fighter_id, start/punch time, end time,
+# speed, power, x, y, combination punch codes, crc32 of everything before it
+RECORD = struct.Struct(f'<BBBxIddffff{MAX_SEQUENCE}s')
+CRC = struct.Struct('<I')
+RECORD_SIZE = RECORD.size + CRC.size
+
+PUNCH = 1
+COMBINATION = 2
+
+
+def event_log_path(session_id):
+    return os.path.join(Config.EVENT_LOG_DIR, f"session_{session_id}.evlog")
+
+
+def _punch_type(code):
+    return PUNCH_TYPES[code - 1] if 0 < code <= len(PUNCH_TYPES) else "Other"
+
+
+class SessionEventLog:
+    """
+    Append-only binary log of the punches and combinations of one session.
+
+    Every event is one fixed-size, CRC-protected record appended the moment
+    it is detected, so appends are just buffered writes. A background thread
+    fsyncs the file every ``sync_interval`` seconds, or sooner once
+    ``sync_every`` records are pending, which bounds what a power cut can lose
+    without paying for an fsync per punch. ``replay_event_log`` turns the file
+    into database rows at session end or after a crash.
+    """
+
+    def __init__(self, session_id, path=None, sync_every=None, sync_interval=None):
+        self.session_id = session_id
+        self.path = path or event_log_path(session_id)
+        self.sync_every = sync_every or Config.EVENT_LOG_SYNC_EVERY
+        self.sync_interval = sync_interval or Config.EVENT_LOG_SYNC_INTERVAL
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, 'ab')
+        if new_file:
+            self.file.write(HEADER.pack(MAGIC, VERSION, session_id))
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        self.records = 0
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._sync_loop, daemon=True,
+                                       name=f"event-log-{session_id}")
+        self.thread.start()
+
+    def _append(self, record):
+        with self.lock:
+            if self.closed:
+                return
+            self.file.write(record + CRC.pack(zlib.crc32(record)))
+            self.records += 1
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every:
+                self.wake.set()
+
+    def append_punch(self, fighter_id, punch_type, timestamp, speed, power=None, x=0.0, y=0.0):
+        self._append(RECORD.pack(PUNCH, PUNCH_CODES.get(punch_type, 0), 0, fighter_id,
+                                 timestamp, 0.0, speed, power or 0.0, x, y, b''))
+
+    def append_combination(self, fighter_id, punch_types, start_time, end_time):
+        if len(punch_types) > MAX_SEQUENCE:
+            logging.warning(f"Combination of {len(punch_types)} punches truncated to {MAX_SEQUENCE}")
+            punch_types = punch_types[:MAX_SEQUENCE]
+        codes = bytes(PUNCH_CODES.get(punch_type, 0) for punch_type in punch_types)
+        self._append(RECORD.pack(COMBINATION, 0, len(codes), fighter_id,
+                                 start_time, end_time, 0.0, 0.0, 0.0, 0.0, codes))
+
+    def sync(self):
+        with self.lock:
+            if not self.unsynced or self.file.closed:
+                return
+            self.file.flush()
+            self.unsynced = 0
+            fd = self.file.fileno()
+        os.fsync(fd)
+
+    def _sync_loop(self):
+        while not self.closed:
+            self.wake.wait(self.sync_interval)
+            self.wake.clear()
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                if not self.closed:
+                    logging.error(f"Event log sync failed for session {self.session_id}: {e}")
+
+    def close(self):
+        """Flush, fsync and close; safe to call twice"""
+        if self.closed:
+            return
+        self.sync()
+        with self.lock:
+            self.closed = True
+            self.file.close()
+        self.wake.set()
+        self.thread.join(1.0)
+
+
+def read_event_log(path):
+    """
+    Return ``(session_id, punches, combinations)`` decoded from a log file.
+
+    Reading stops at the first short or corrupt record, which is where a
+    crash interrupted the last write.
+    """
+    punches, combinations = [], []
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None, punches, combinations
+        magic, version, session_id = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} event log")
+        while True:
+            chunk = f.read(RECORD_SIZE)
+            if len(chunk) < RECORD_SIZE:
+                break
+            record, (crc,) = chunk[:RECORD.size], CRC.unpack(chunk[RECORD.size:])
+            if zlib.crc32(record) != crc:
+                logging.warning(f"Corrupt record in {path}, ignoring the rest of the log")
+                break
+            kind, code, length, fighter_id, start, end, speed, power, x, y, codes = RECORD.unpack(record)
+            if kind == PUNCH:
+                punches.append({
+                    'session_id': session_id,
+                    'fighter_id': fighter_id,
+                    'punch_type': _punch_type(code),
+                    'timestamp': start,
+                    'speed': speed,
+                    'power': power,
+                    'x_position': x,
+                    'y_position': y
+                })
+            elif kind == COMBINATION:
+                combinations.append((fighter_id, "-".join(_punch_type(c) for c in codes[:length]), start, end))
+    return session_id, punches, combinations
+
+
+def replay_event_log(path, remove=True):
+    """
+    Bulk-load a session's event log into ``punch_data`` and ``combinations``.
+
+    Punches already written by the persistence worker are matched on
+    (fighter, type, timestamp) and skipped, so replaying is idempotent. The
+    session's combination rows are rebuilt from the logged occurrences. Must
+    run inside an application context.
+    """
+    session_id, punches, combinations = read_event_log(path)
+    if session_id is None:
+        if remove:
+            os.remove(path)
+        return 0
+
+    with db.engine.begin() as connection:
+        punch_table = PunchData.__table__
+        stored = Counter(connection.execute(
+            db.select(punch_table.c.fighter_id, punch_table.c.punch_type, punch_table.c.timestamp)
+            .where(punch_table.c.session_id == session_id)).all())
+        missing = []
+        for punch in punches:
+            key = (punch['fighter_id'], punch['punch_type'], punch['timestamp'])
+            if stored[key]:
+                stored[key] -= 1
+            else:
+                missing.append(punch)
+        if missing:
+            connection.execute(punch_table.insert(), missing)
+            apply_punch_stats(connection, missing)
+
+        if combinations:
+            combos = {}
+            for fighter_id, sequence, start, end in combinations:
+                combo = combos.setdefault((fighter_id, sequence), [0, start, end])
+                combo[0] += 1
+                combo[1], combo[2] = min(combo[1], start), max(combo[2], end)
+            combo_table = Combination.__table__
+            connection.execute(combo_table.delete().where(combo_table.c.session_id == session_id))
+            connection.execute(combo_table.insert(), [
+                {'session_id': session_id, 'fighter_id': fighter_id, 'sequence': sequence,
+                 'start_time': start, 'end_time': end, 'frequency': frequency}
+                for (fighter_id, sequence), (frequency, start, end) in combos.items()
+            ])
+
+    response_cache.invalidate(f"session:{session_id}")
+    if remove:
+        os.remove(path)
+    logging.info(f"Replayed event log for session {session_id}: {len(missing)} punches recovered, "
+                 f"{len(combinations)} combinations")
+    return len(missing)
+
+
+def recover_event_logs(app):
+    """Replay logs left behind by sessions that never ended (e.g. after a crash)"""
+    recovered = 0
+    with app.app_context():
+        for path in sorted(glob.glob(os.path.join(Config.EVENT_LOG_DIR, 'session_*.evlog'))):
+            try:
+                session_id, punches, _ = read_event_log(path)
+                recovered += replay_event_log(path)
+                session = db.session.get(Session, session_id) if session_id else None
+                if session is not None and not session.duration and punches:
+                    started = session.date.replace(tzinfo=timezone.utc).timestamp()
+                    session.duration = int(max(0, max(p['timestamp'] for p in punches) - started))
+                    db.session.commit()
+                    response_cache.invalidate(f"session:{session_id}")
+            except Exception as e:
+                logging.error(f"Could not recover event log {path}: {e}", exc_info=True)
+    return recovered
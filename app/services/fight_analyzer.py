@@ -1,169 +1,237 @@
 from datetime import datetime
 import asyncio
-from app.models.models import db, Session, Fighter, PunchData, Combination
-from app.services.punch_detector import PunchDetector
-from app.services.camera import AsyncSingleCameraRunner
+import os
+from flask import current_app
+from app.config import Config
+from app.models import repository
+from app.models.async_db import database
+from app.services.punch_detector import VectorizedPunchDetector
+from app.services.camera import AsyncMultiCameraRunner
+from app.services.combination_miner import CombinationMiner
+from app.services.combinations import CombinationAggregator
+from app.services.event_bus import event_bus, PUNCH, COMBINATION, SESSION
+from app.services.event_log import SessionEventLog, replay_event_log
+from app.services.fighter_cache import fighter_cache
+from app.services.persistence import PersistenceWorker
+from app.services.process_pipeline import ProcessPipelineRunner
+from app.services.response_cache import response_cache
+from app.services.tracker import PoseTracker
+from app.utils.pose_utils import RIGHT_WRIST
 
 class AsyncFightAnalyzer:
-    def __init__(self, camera_id=0):
-        self.detector = PunchDetector()
+    def __init__(self, camera_id=0, camera_ids=None, bus=None, inference=None, writer=None,
+                 combinations=None, max_in_flight=None):
+        self.bus = bus or event_bus
+        self.detector = VectorizedPunchDetector()
+        self.trackers = {}  # camera_id -> PoseTracker
+        self.fighter_slots = {}  # camera_id -> {track_id: index into the session's fighter_ids}
+        # The session manager shares one writer and aggregator across analyzers
+        self.writer = writer or PersistenceWorker()
+        self.combinations = combinations or CombinationAggregator()
+        self.writer.add_flusher(self.combinations.flush)  # Upserted on the writer's timer
         self.active_sessions = {}
-        self.camera_runner = AsyncSingleCameraRunner(camera_id)
+        # Every configured camera, or just ``camera_id`` when none are configured
+        camera_ids = camera_ids or Config.CAMERA_IDS or [camera_id]
+        if Config.PIPELINE_MODE == 'process':
+            # Capture and inference in worker processes; detection stays here
+            self.camera_runner = ProcessPipelineRunner(camera_ids)
+        else:
+            self.camera_runner = AsyncMultiCameraRunner(camera_ids, inference=inference, max_in_flight=max_in_flight)
 
     async def start_session(self, fighter_ids):
         """Start a new training/fight session"""
-        session = Session(date=datetime.utcnow(), duration=0)
-        session.fighters = Fighter.query.filter(Fighter.id.in_(fighter_ids)).all()
-        db.session.add(session)
-        db.session.commit()
+        # Awaited on the async engine; the event loop keeps serving other sessions
+        fighters = await database.call(repository.get_fighters, fighter_ids)
+        for fighter in fighters:
+            fighter_cache.put(fighter)  # Names for live events
+        session_id = await database.call(repository.create_session, [fighter['id'] for fighter in fighters])
 
-        self.active_sessions[session.id] = {
+        self.active_sessions[session_id] = {
             'start_time': datetime.utcnow(),
             'fighter_ids': fighter_ids,
-            'punches': [],
-            'combinations': {},
-            'current_combo': {fighter_id: [] for fighter_id in fighter_ids}
+            'miner': CombinationMiner(),
+            'event_log': SessionEventLog(session_id)
         }
 
-        await self.camera_runner.start()
-        return session.id
-
-    async def process_frame(self, session_id):
-        """Process the latest frame from the camera"""
+        self.app = current_app._get_current_object()
+        self.writer.start(self.app)
+        if not await self.camera_runner.start():
+            # Nothing would ever be recorded; leave no trace of the session
+            event_log = self.active_sessions.pop(session_id)['event_log']
+            event_log.close()
+            os.remove(event_log.path)
+            await database.call(repository.delete_session, session_id)
+            raise RuntimeError("No camera could be started")
+        self.bus.publish(SESSION, {'session_id': session_id, 'status': 'started'})
+        return session_id
+
+    async def process_frame(self, session_id, timeout=0.1):
+        """Process the next unseen inference result, waiting up to ``timeout`` for it"""
         if session_id not in self.active_sessions:
             return False
 
-        result = self.camera_runner.get_latest_result()
+        result = await self.camera_runner.next_result(timeout)
         if not result:
-            await asyncio.sleep(0.001)  # Yield if no frame is available
             return False
+        return await self.process_result(session_id, result)
 
-        frame_time, frame, keypoints_list = result
-
-        for person in keypoints_list:
-            person_id = person['person_id']
-            punch_data = self.detector.detect_punch_type(
-                person['keypoints'], person_id, frame_time)
-
-            if punch_data:
-                fighter_ids = self.active_sessions[session_id]['fighter_ids']
-                fighter_id = fighter_ids[person_id % len(fighter_ids)]
-
-                db_punch_data = {
-                    'session_id': session_id,
-                    'fighter_id': fighter_id,
-                    'punch_type': punch_data['type'],
-                    'timestamp': punch_data['timestamp'],
-                    'speed': punch_data['speed'],
-                    'x_position': person['keypoints'][9][0] if person['keypoints'][9][2] > 0.3 else 0,
-                    'y_position': person['keypoints'][9][1] if person['keypoints'][9][2] > 0.3 else 0
-                }
-
-                self.active_sessions[session_id]['punches'].append(db_punch_data)
-        
-        # Periodically save punches (less frequent to reduce DB load)
-        if len(self.active_sessions[session_id]['punches']) > 50:
-            await self._save_punches(session_id)
+    async def process_result(self, session_id, result):
+        """Track, detect and record punches in one ``camera_runner.next_result`` result"""
+        if session_id not in self.active_sessions:
+            return False
+
+        camera_id, frame_id, frame_time, frame, pose = result
+
+        # Stable track ids per camera; state of people who left is dropped
+        tracker = self.trackers.setdefault(camera_id, PoseTracker())
+        evicted = tracker.update(pose)
+        if evicted:
+            self.detector.evict([(camera_id, track_id) for track_id in evicted])
+        fighter_ids = self.active_sessions[session_id]['fighter_ids']
+        slots = self._assign_fighters(camera_id, tracker, pose.track_ids.tolist(), evicted, len(fighter_ids))
+
+        # Every person and arm in the frame is scored in one vectorized pass;
+        # detector state is keyed per camera since ids are only unique per view
+        for row, punch_data in self.detector.detect_frame(pose):
+            slot = slots.get(int(pose.track_ids[row]))
+            if slot is None:
+                continue  # Someone besides the fighters, e.g. the referee
+            keypoints = pose.keypoints[row]
+            fighter_id = fighter_ids[slot]
+            wrist_x, wrist_y, wrist_conf = keypoints[RIGHT_WRIST].tolist()
+
+            db_punch_data = {
+                'session_id': session_id,
+                'fighter_id': fighter_id,
+                'punch_type': punch_data['type'],
+                'timestamp': punch_data['timestamp'],
+                'speed': punch_data['speed'],
+                'power': punch_data['power'],
+                'x_position': wrist_x if wrist_conf > 0.3 else 0,
+                'y_position': wrist_y if wrist_conf > 0.3 else 0
+            }
+
+            # The event log is the durable record; it survives a crash before
+            # the row below reaches the database and is replayed at session end
+            self.active_sessions[session_id]['event_log'].append_punch(
+                fighter_id, db_punch_data['punch_type'], db_punch_data['timestamp'], db_punch_data['speed'],
+                db_punch_data['power'], db_punch_data['x_position'], db_punch_data['y_position'])
+
+            # Written behind by the persistence thread; never waits on the database
+            self.writer.enqueue_punch(db_punch_data)
+            self.bus.publish(PUNCH, {
+                'session_id': session_id,
+                'fighter_id': fighter_id,
+                'fighter_name': fighter_cache.name(fighter_id),  # Subscribers never query fighters
+                'punch_type': db_punch_data['punch_type'],
+                'timestamp': db_punch_data['timestamp'],
+                'speed': db_punch_data['speed'],
+                'power': db_punch_data['power'],
+                'hit_landed': True  # Placeholder
+            })
+            await self._update_combinations(session_id, fighter_id, punch_data['type'], punch_data['timestamp'])
 
         return True
 
+    def _assign_fighters(self, camera_id, tracker, track_ids, evicted, fighter_count):
+        """
+        Map this camera's tracks to fighter slots, in order of appearance.
+
+        A slot stays with its track until the tracker evicts it. A new track
+        takes a free slot, or else the slot of the fighter track that has gone
+        longest unseen and is not in this frame: the tracker opens a new track
+        when a fast punch moves someone's keypoint box too far, and the old one
+        lingers until it times out.
+        """
+        slots = self.fighter_slots.setdefault(camera_id, {})
+        for track_id in evicted:
+            slots.pop(track_id, None)
+        for track_id in track_ids:
+            if track_id in slots:
+                continue
+            taken = set(slots.values())
+            free = [slot for slot in range(fighter_count) if slot not in taken]
+            if free:
+                slots[track_id] = free[0]
+                continue
+            last_seen = dict(zip(tracker.track_ids.tolist(), tracker.last_seen.tolist()))
+            stale = [other for other in slots if other not in track_ids]
+            if stale:
+                slots[track_id] = slots.pop(min(stale, key=lambda other: last_seen.get(other, 0.0)))
+        return slots
+
+    def get_frame_stats(self):
+        """Per-camera health, frame counters and live track counts"""
+        health = self.camera_runner.health()
+        for camera_id, status in health.items():
+            tracker = self.trackers.get(camera_id)
+            status['live_tracks'] = tracker.live_tracks if tracker else 0
+        return health
+
+    def get_persistence_stats(self):
+        """Write-behind queue depth and backpressure counters"""
+        return dict(self.writer.stats, queue_depth=self.writer.queue_depth(),
+                    combinations=dict(self.combinations.stats))
+
     async def end_session(self, session_id):
         """End an active session and save all data"""
         if session_id not in self.active_sessions:
             return False
 
+        if self.camera_runner.running:
+            await self.camera_runner.stop()
+
         start_time = self.active_sessions[session_id]['start_time']
         duration_seconds = (datetime.utcnow() - start_time).total_seconds()
 
-        session = Session.query.get(session_id)
-        if session:
-            session.duration = int(duration_seconds)
-            db.session.commit()
-
-        await self._save_punches(session_id)
         await self._finalize_combinations(session_id)
-        await self.camera_runner.stop()
+        await self.writer.drain_async()  # Every punch and combination counter so far is on disk
+        self.combinations.discard(session_id)
+
+        # Bulk-load whatever the writer missed (dropped or failed rows) and the
+        # session's combinations from the event log
+        event_log = self.active_sessions[session_id]['event_log']
+        event_log.close()
+        await asyncio.to_thread(self._replay_event_log, event_log.path)
+
+        # Written last: a session with a duration has all its data on disk,
+        # which is what lets its cached response live forever
+        await database.call(repository.finish_session, session_id, int(duration_seconds))
+        response_cache.invalidate(f"session:{session_id}")
 
         del self.active_sessions[session_id]
+        self.bus.publish(SESSION, {'session_id': session_id, 'status': 'ended'})
         return True
 
-    async def _save_punches(self, session_id):
-        """Save accumulated punches to database (using bulk insert)"""
-        punches = self.active_sessions[session_id]['punches']
-        if punches:
-            punch_objs = [PunchData(**punch) for punch in punches]
-            db.session.bulk_save_objects(punch_objs)
-            db.session.commit()
-            self.active_sessions[session_id]['punches'].clear()
+    def _replay_event_log(self, path):
+        with self.app.app_context():
+            replay_event_log(path)
 
     async def _update_combinations(self, session_id, fighter_id, punch_type, timestamp):
-        """Track and update punch combinations"""
-        current_combo = self.active_sessions[session_id]['current_combo'][fighter_id]
-        
-        # If the combo is empty or the time gap is too large, start a new combo
-        if not current_combo or (timestamp - current_combo[-1][1]) > 1.5:  # 1.5 second gap breaks a combo
-            current_combo.clear()
-        
-        current_combo.append((punch_type, timestamp))
-
-        # Example: Save combo if 3 or more punches within 3 seconds
-        if len(current_combo) >= 3:
-            time_diff = current_combo[-1][1] - current_combo[0][1]
-            if time_diff <= 3:
-                combo_str = "-".join([pt for pt, _ in current_combo])
-                
-                # Use a subquery to efficiently check for existing combos
-                existing = db.session.query(Combination).filter(
-                    Combination.session_id == session_id,
-                    Combination.fighter_id == fighter_id,
-                    Combination.sequence == combo_str
-                ).first()
-                
-                if existing:
-                    existing.frequency += 1
-                    existing.end_time = current_combo[-1][1]  # Update end time
-                    db.session.commit()
-                else:
-                    # Create new combination
-                    new_combo = Combination(
-                        session_id=session_id,
-                        fighter_id=fighter_id,
-                        sequence=combo_str,
-                        start_time=current_combo[0][1],
-                        end_time=current_combo[-1][1],
-                        frequency=1
-                    )
-                    db.session.add(new_combo)
-                    db.session.commit()
-            
-            # Clear the combo after recording it
-            current_combo.clear()
+        """Mine the combinations this punch completes; counters are written in batches by the persistence thread"""
+        session = self.active_sessions[session_id]
+        miner = session['miner']
+        for punch_types, start_time, end_time in miner.add(fighter_id, punch_type, timestamp):
+            sequence = "-".join(punch_types)
+            self.combinations.record(session_id, fighter_id, sequence, start_time, end_time)
+            session['event_log'].append_combination(fighter_id, punch_types, start_time, end_time)
+            self.bus.publish(COMBINATION, {
+                'session_id': session_id,
+                'fighter_id': fighter_id,
+                'fighter_name': fighter_cache.name(fighter_id),
+                'sequence': sequence,
+                'frequency': miner.count(fighter_id, punch_types),
+                'start_time': start_time,
+                'end_time': end_time
+            })
 
     async def _finalize_combinations(self, session_id):
-        """Save any remaining combinations at the end of a session"""
-        for fighter_id, combo in self.active_sessions[session_id]['current_combo'].items():
-            if len(combo) >= 2:  # Only save combos with at least 2 punches
-                combo_str = "-".join([pt for pt, _ in combo])
-                
-                # Use a subquery to efficiently check for existing combos
-                existing = db.session.query(Combination).filter(
-                    Combination.session_id == session_id,
-                    Combination.fighter_id == fighter_id,
-                    Combination.sequence == combo_str
-                ).first()
-                
-                if existing:
-                    existing.frequency += 1
-                    existing.end_time = combo[-1][1]
-                    db.session.commit()
-                else:
-                    new_combo = Combination(
-                        session_id=session_id,
-                        fighter_id=fighter_id,
-                        sequence=combo_str,
-                        start_time=combo[0][1],
-                        end_time=combo[-1][1],
-                        frequency=1
-                    )
-                    db.session.add(new_combo)
-                    db.session.commit()
\ No newline at end of file
+        """Close the fighters' open flurries; every combination was recorded as its last punch landed"""
+        self.active_sessions[session_id]['miner'].end_flurries()
+
+    def get_top_combinations(self, session_id, k=None):
+        """``{fighter_id: [(sequence, count)]}`` of a live session's most frequent combinations"""
+        session = self.active_sessions.get(session_id)
+        if session is None:
+            return {}
+        return {fighter_id: session['miner'].top(fighter_id, k) for fighter_id in session['fighter_ids']}
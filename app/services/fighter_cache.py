@@ -0,0 +1,94 @@
+import threading
+import time
+from app.config import Config
+from app.models import repository
+from app.models.async_db import database
+
+
+class FighterCache:
+    """
+    Fighter profiles kept in memory for the live pipeline and the API.
+
+    Every fighter is loaded with one query through the async repository the
+    first time the cache is used; after that ``get`` and ``name`` are
+    dictionary lookups, so emitting events never reads the database. Fighter
+    writes keep it current with ``put``. Ids that are still unknown are looked
+    up in one query per call; ids that don't exist are remembered for
+    ``miss_ttl`` seconds so repeated lookups of a bad id don't reach the
+    database. Call these from threads, not from a running event loop.
+    """
+
+    def __init__(self, miss_ttl=None):
+        self.miss_ttl = miss_ttl or Config.FIGHTER_CACHE_MISS_TTL
+        self.lock = threading.Lock()
+        self.profiles = {}  # fighter_id -> profile dict
+        self.missing = {}  # fighter_id -> monotonic time until which it is known not to exist
+        self.loaded = False
+        self.stats = {'loads': 0, 'hits': 0, 'misses': 0, 'negative_hits': 0}
+
+    def load(self):
+        """(Re)load every fighter"""
+        profiles = {profile['id']: profile for profile in database.call_sync(repository.list_fighters)}
+        with self.lock:
+            self.profiles = profiles
+            self.missing = {}
+            self.loaded = True
+            self.stats['loads'] += 1
+
+    def get(self, fighter_id):
+        """Profile of ``fighter_id``, or None if there is no such fighter"""
+        profiles = self.get_many([fighter_id])
+        return profiles[0] if profiles else None
+
+    def get_many(self, fighter_ids):
+        """Profiles of the known ``fighter_ids``, in order"""
+        if not self.loaded:
+            self.load()
+        unknown = [fighter_id for fighter_id in fighter_ids if fighter_id not in self.profiles]
+        self.stats['hits'] += len(fighter_ids) - len(unknown)
+        if unknown:
+            self._fetch(unknown)
+        return [self.profiles[fighter_id] for fighter_id in fighter_ids if fighter_id in self.profiles]
+
+    def _fetch(self, fighter_ids):
+        """Look up ids added behind our back, remembering the ones that don't exist"""
+        now = time.monotonic()
+        with self.lock:
+            wanted = [fighter_id for fighter_id in fighter_ids if self.missing.get(fighter_id, 0) <= now]
+        self.stats['negative_hits'] += len(fighter_ids) - len(wanted)
+        if not wanted:
+            return
+        self.stats['misses'] += len(wanted)
+        for profile in database.call_sync(repository.get_fighters, wanted):
+            self.put(profile)
+        with self.lock:
+            expires = time.monotonic() + self.miss_ttl
+            for fighter_id in wanted:
+                if fighter_id not in self.profiles:
+                    self.missing[fighter_id] = expires
+
+    def all(self):
+        """Every profile, by id"""
+        if not self.loaded:
+            self.load()
+        return sorted(self.profiles.values(), key=lambda profile: profile['id'])
+
+    def name(self, fighter_id, default="Unknown"):
+        """Display name for live events; never touches the database once loaded"""
+        profile = self.profiles.get(fighter_id)
+        return profile['name'] if profile is not None else default
+
+    def put(self, profile):
+        """Store a fighter profile just written through the repository"""
+        with self.lock:
+            self.profiles[profile['id']] = profile
+            self.missing.pop(profile['id'], None)
+        return profile
+
+    def invalidate(self, fighter_id):
+        """Forget a fighter the database no longer has"""
+        with self.lock:
+            self.profiles.pop(fighter_id, None)
+
+
+fighter_cache = FighterCache()
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+from app.config import Config
+
+class MotionGate:
+    """
+    Cheap pre-inference check for scene motion.
+
+    Frames are shrunk to a thumbnail and compared with the previous one. While
+    the mean absolute difference stays under ``threshold`` only every
+    ``static_stride``-th frame is let through, so rest periods cost a fraction
+    of the inference they used to.
+    """
+
+    def __init__(self, threshold=None, static_stride=None, size=(64, 48)):
+        self.threshold = threshold if threshold is not None else Config.MOTION_THRESHOLD
+        self.static_stride = static_stride or Config.MOTION_STATIC_STRIDE
+        self.size = size
+        self.previous = None
+        self.static_frames = 0
+        self.last_motion = 0.0
+
+    def should_infer(self, frame):
+        thumbnail = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA),
+                                 cv2.COLOR_BGR2GRAY)
+        previous, self.previous = self.previous, thumbnail
+        if previous is None:
+            return True
+
+        self.last_motion = float(cv2.absdiff(thumbnail, previous).mean())
+        if self.last_motion >= self.threshold:
+            self.static_frames = 0
+            return True
+        self.static_frames += 1
+        return self.static_frames % self.static_stride == 0
+
+
+class RoiCropper:
+    """
+    Crops frames to the area around recently tracked people.
+
+    The region is the union of the last detected keypoints, padded by
+    ``margin`` of its size. Every ``full_frame_interval`` frames, and whenever
+    nobody is tracked, the full frame goes through instead so people walking
+    into view are picked up.
+    """
+
+    def __init__(self, margin=None, full_frame_interval=None, min_size=96):
+        self.margin = margin if margin is not None else Config.ROI_MARGIN
+        self.full_frame_interval = full_frame_interval or Config.ROI_FULL_FRAME_INTERVAL
+        self.min_size = min_size
+        self.box = None  # (x0, y0, x1, y1) in frame pixels
+        self.frames_since_full = 0
+
+    def crop(self, frame):
+        """Return ``(view, (x_offset, y_offset))``; the view shares the frame's memory"""
+        self.frames_since_full += 1
+        if self.box is None or self.frames_since_full >= self.full_frame_interval:
+            self.frames_since_full = 0
+            return frame, (0, 0)
+        x0, y0, x1, y1 = self.box
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+    def update(self, keypoints, frame_shape):
+        """Refresh the region from ``(persons, 17, 3)`` keypoints in frame coordinates"""
+        if keypoints is None or not len(keypoints):
+            self.box = None
+            return
+        visible = keypoints[:, :, 2] > 0.3
+        if not visible.any():
+            self.box = None
+            return
+
+        points = keypoints[:, :, :2][visible]
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        pad_x = max((x1 - x0) * self.margin, (self.min_size - (x1 - x0)) / 2, 0)
+        pad_y = max((y1 - y0) * self.margin, (self.min_size - (y1 - y0)) / 2, 0)
+        height, width = frame_shape[:2]
+        self.box = (int(max(0, x0 - pad_x)), int(max(0, y0 - pad_y)),
+                    int(min(width, np.ceil(x1 + pad_x))), int(min(height, np.ceil(y1 + pad_y))))
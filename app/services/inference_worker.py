@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.utils.model_loader import pose_models
+
+class BatchInferenceWorker:
+    """
+    Runs the pose model off the event loop and batches frames across callers.
+
+    Callers submit single frames and get a future back. A collector task groups
+    pending frames (up to ``batch_size``, waiting at most ``max_wait`` seconds
+    for the batch to fill), runs one forward pass on a worker thread and
+    resolves each caller's future with its own per-frame result.
+
+    Without an explicit ``model`` the worker borrows instances from the shared
+    ``pose_models`` registry, running up to ``MODEL_POOL_SIZE`` batches at once.
+    """
+
+    def __init__(self, model=None, batch_size=None, max_wait=None, max_workers=None):
+        self.model = model
+        self.batch_size = batch_size or Config.INFERENCE_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else Config.INFERENCE_MAX_WAIT_MS / 1000.0
+        self.max_workers = max_workers or (1 if model is not None else pose_models.pool_size)
+        self.slots = None
+        self.executor = None
+        self.queue = None
+        self.task = None
+        self.executing = set()
+        self.stats = {'batches': 0, 'frames': 0, 'errors': 0, 'last_batch_size': 0, 'last_latency': 0.0}
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        if self.running:
+            return self
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.max_workers)
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    def submit(self, frame, imgsz=None):
+        """Queue a frame for inference and return a future for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((frame, imgsz, future))
+        return future
+
+    async def infer(self, frame, imgsz=None):
+        return await self.submit(frame, imgsz)
+
+    def queue_depth(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict(self, groups):
+        """Run one forward pass per input size in the batch"""
+        if self.model is not None:
+            return [self._predict_group(self.model, frames, imgsz, {}) for imgsz, frames in groups]
+        with pose_models.acquire() as model:
+            defaults = pose_models.predict_kwargs()
+            return [self._predict_group(model, frames, imgsz, defaults) for imgsz, frames in groups]
+
+    def _predict_group(self, model, frames, imgsz, defaults):
+        kwargs = dict(defaults, **({'imgsz': imgsz} if imgsz else {}))
+        return model(frames, verbose=False, **kwargs)
+
+    async def _run(self):
+        while True:
+            # Collect only once a model instance is free, so frames that arrive
+            # while every instance is busy end up in the next batch
+            await self.slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self.slots.release()
+                raise
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                self.slots.release()
+                continue
+            task = asyncio.create_task(self._execute(batch))
+            self.executing.add(task)
+            task.add_done_callback(self.executing.discard)
+
+    async def _execute(self, batch):
+        loop = asyncio.get_running_loop()
+        # Frames at different input sizes (see adaptive control) can't share a pass
+        groups = {}
+        for frame, imgsz, future in batch:
+            groups.setdefault(imgsz, []).append((frame, future))
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self._predict,
+                [(imgsz, [frame for frame, _ in items]) for imgsz, items in groups.items()])
+        except Exception as e:
+            logging.error(f"Batched inference failed: {e}", exc_info=True)
+            self.stats['errors'] += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+
+        self.stats['batches'] += 1
+        self.stats['frames'] += len(batch)
+        self.stats['last_batch_size'] = len(batch)
+        self.stats['last_latency'] = time.perf_counter() - started
+        for items, group_results in zip(groups.values(), results):
+            for (_, future), result in zip(items, group_results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        while self.queue and not self.queue.empty():
+            *_, future = self.queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from sqlalchemy.exc import DBAPIError, OperationalError
+from app.config import Config
+from app.models.models import db, PunchData
+from app.services.punch_stats import apply_punch_stats
+from app.services.response_cache import response_cache
+
+class _Barrier:
+    """Queue marker that is acknowledged once everything before it is written."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class PersistenceWorker:
+    """
+    Write-behind persistence for detected punches.
+
+    The frame loop hands rows to ``enqueue_punch``, which never blocks: rows go
+    into a bounded queue drained by a dedicated thread. The thread writes a
+    batch when ``batch_size`` rows have accumulated or ``flush_interval``
+    seconds have passed, as one Core-level ``executemany`` INSERT, and retries
+    transient database errors with backoff. When the queue is full the row is
+    dropped and counted so backpressure shows up in ``stats`` instead of
+    stalling capture and inference. ``drain`` waits until everything queued
+    so far is on disk. Callables registered with ``add_flusher`` (batched
+    aggregates such as combination counters) run on the same thread after
+    every write cycle, so they are flushed on the timer and by ``drain`` too.
+    Each batch also updates the ``punch_stats`` rollup in its transaction.
+    """
+
+    def __init__(self, max_queue=None, batch_size=None, flush_interval=None, max_retries=3):
+        self.queue = queue.Queue(maxsize=max_queue or Config.PERSIST_QUEUE_SIZE)
+        self.batch_size = batch_size or Config.PERSIST_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.PERSIST_FLUSH_INTERVAL
+        self.max_retries = max_retries
+        self.app = None
+        self.thread = None
+        self.running = False
+        self.flushers = []
+        self.stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'retries': 0,
+                      'failed_rows': 0, 'dropped': 0, 'queue_high_water': 0}
+
+    def start(self, app):
+        """Start the writer thread; ``app`` provides the database configuration"""
+        if self.running:
+            return
+        self.app = app
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name='persistence')
+        self.thread.start()
+
+    def add_flusher(self, flusher):
+        """Run ``flusher()`` inside an app context after every write cycle"""
+        if flusher not in self.flushers:
+            self.flushers.append(flusher)
+
+    def enqueue_punch(self, row):
+        """Queue a punch row for writing; returns False if it had to be dropped"""
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            if self.stats['dropped'] % 100 == 1:
+                logging.warning(f"Persistence queue full, {self.stats['dropped']} punches dropped so far")
+            return False
+        self.stats['enqueued'] += 1
+        depth = self.queue.qsize()
+        if depth > self.stats['queue_high_water']:
+            self.stats['queue_high_water'] = depth
+        return True
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def drain(self, timeout=None):
+        """Block until every row queued before this call has been written"""
+        if not self.running:
+            return True
+        barrier = _Barrier()
+        try:
+            self.queue.put(barrier, timeout=timeout)
+        except queue.Full:
+            return False
+        return barrier.done.wait(timeout)
+
+    async def drain_async(self, timeout=None):
+        """``drain`` without blocking the event loop"""
+        return await asyncio.to_thread(self.drain, timeout)
+
+    def stop(self, timeout=None):
+        if not self.running:
+            return
+        self.drain(timeout)
+        self.running = False
+        self.queue.put(None)  # Wake the thread so it can exit
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        rows = []
+        barriers = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, _Barrier):
+                barriers.append(item)
+            elif item is not None:
+                rows.append(item)
+
+            if barriers or len(rows) >= self.batch_size or time.monotonic() >= deadline:
+                if rows:
+                    self._write(rows)
+                    rows = []
+                self._run_flushers()
+                for barrier in barriers:
+                    barrier.done.set()
+                barriers = []
+                deadline = time.monotonic() + self.flush_interval
+
+            if not self.running and self.queue.empty():
+                break
+
+    def _run_flushers(self):
+        for flusher in self.flushers:
+            try:
+                with self.app.app_context():
+                    flusher()
+            except Exception as e:
+                logging.error(f"Periodic flush failed: {e}", exc_info=True)
+
+    def _write(self, rows):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(PunchData.__table__.insert(), rows)
+                        apply_punch_stats(connection, rows)  # Same transaction, so the rollup never drifts
+                self.stats['written'] += len(rows)
+                self.stats['batches'] += 1
+                response_cache.invalidate(*{f"session:{row['session_id']}" for row in rows})
+                return True
+            except (OperationalError, DBAPIError) as e:
+                transient = isinstance(e, OperationalError) or e.connection_invalidated
+                if not transient or attempt == self.max_retries:
+                    logging.error(f"Failed to persist {len(rows)} punches: {e}")
+                    break
+                self.stats['retries'] += 1
+                time.sleep(0.1 * 2 ** attempt)
+            except Exception as e:
+                logging.error(f"Failed to persist {len(rows)} punches: {e}", exc_info=True)
+                break
+        self.stats['failed_rows'] += len(rows)
+        return False
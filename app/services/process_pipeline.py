@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+import numpy as np
+from app.config import Config
+from app.utils.pose_utils import NUM_KEYPOINTS, PoseFrame
+from app.utils.shared_ring import SharedRing
+
+CAMERA_UNAVAILABLE = 3  # Exit code of a capture stage whose camera can't be opened; it is not restarted
+
+
+def frame_fields(height, width):
+    return {'frame': ((height, width, 3), np.uint8), 'timestamp': ((1,), np.float64)}
+
+
+def pose_fields(max_persons):
+    return {'keypoints': ((max_persons, NUM_KEYPOINTS, 3), np.float32), 'count': ((1,), np.int32),
+            'frame_seq': ((1,), np.int64), 'timestamp': ((1,), np.float64)}
+
+
+def capture_stage(camera_id, ring_spec, frames_ready, stop):
+    """Process: decode one camera straight into its shared frame ring"""
+    import cv2
+    ring = SharedRing.attach(ring_spec)
+    height, width = ring.fields['frame'][0][:2]
+    stream = cv2.VideoCapture(camera_id, cv2.CAP_DSHOW)
+    stream.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    stream.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    stream.set(cv2.CAP_PROP_FPS, Config.CAPTURE_FPS)
+    stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if not stream.isOpened():
+        logging.error(f"Camera {camera_id} could not be opened")
+        stream.release()
+        ring.close()
+        raise SystemExit(CAMERA_UNAVAILABLE)
+    try:
+        while not stop.is_set():
+            slot = ring.next_slot()
+            ret, frame = stream.read(slot['frame'])
+            if not ret:
+                time.sleep(0.01)  # Camera hiccup, don't spin
+                continue
+            if frame.ctypes.data != slot['frame'].ctypes.data:
+                if frame.shape != slot['frame'].shape:
+                    frame = cv2.resize(frame, (width, height))
+                slot['frame'][...] = frame
+            slot['timestamp'][0] = time.time()
+            ring.publish()
+            frames_ready.set()
+    finally:
+        stream.release()
+        ring.close()
+
+
+def inference_stage(frame_specs, pose_specs, frames_ready, poses_ready, stop):
+    """
+    Process: run the pose model on the newest frame of each of its cameras,
+    one batched pass per wake-up, and write keypoints to the pose rings.
+    """
+    from app.utils.model_loader import pose_models
+    from app.utils.pose_utils import extract_keypoints
+    frame_rings = {camera_id: SharedRing.attach(spec) for camera_id, spec in frame_specs.items()}
+    pose_rings = {camera_id: SharedRing.attach(spec) for camera_id, spec in pose_specs.items()}
+    model = pose_models.get()
+    kwargs = pose_models.predict_kwargs()
+    cursors = dict.fromkeys(frame_rings, 0)
+    try:
+        while not stop.is_set():
+            frames_ready.wait(0.1)
+            frames_ready.clear()
+            batch = []
+            for camera_id, ring in frame_rings.items():
+                seq = ring.write_seq
+                if seq > cursors[camera_id]:
+                    record = ring.read(seq, copy=False)  # The model reads shared memory directly
+                    if record is not None:
+                        batch.append((camera_id, seq, float(record['timestamp'][0]), record['frame']))
+            if not batch:
+                continue
+
+            results = model([frame for _, _, _, frame in batch], verbose=False, **kwargs)
+            for (camera_id, seq, timestamp, _), result in zip(batch, results):
+                cursors[camera_id] = seq
+                if not frame_rings[camera_id].valid(seq):
+                    continue  # Overwritten by capture while the model read it
+                keypoints = extract_keypoints(result).keypoints
+                ring = pose_rings[camera_id]
+                out = ring.next_slot()
+                count = min(len(keypoints), out['keypoints'].shape[0])
+                out['keypoints'][:count] = keypoints[:count]
+                out['count'][0] = count
+                out['frame_seq'][0] = seq
+                out['timestamp'][0] = timestamp
+                ring.publish()
+            poses_ready.set()
+    finally:
+        for ring in list(frame_rings.values()) + list(pose_rings.values()):
+            ring.close()
+
+
+class _Stage:
+    __slots__ = ('name', 'target', 'args', 'final_exitcodes', 'failed', 'process', 'restarts', 'started',
+                 'next_start', 'backoff')
+
+    def __init__(self, name, target, args, final_exitcodes):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.final_exitcodes = final_exitcodes  # Exits that a restart would not fix
+        self.failed = False
+        self.process = None
+        self.restarts = 0
+        self.started = 0.0
+        self.next_start = 0.0
+        self.backoff = 1.0
+
+
+class PipelineSupervisor:
+    """
+    Runs pipeline stages as processes and restarts any that die.
+
+    A crashed stage is restarted after a backoff that doubles (up to
+    ``max_backoff`` seconds) while it keeps crashing and resets once it has
+    stayed up for a minute. Shared memory belongs to the parent, so a
+    restarted stage attaches to the same rings and carries on. A stage that
+    exits with one of its ``final_exitcodes`` is left down.
+    """
+
+    def __init__(self, context, stop_event, check_interval=0.5, max_backoff=30.0):
+        self.context = context
+        self.stop_event = stop_event
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self.stages = []
+        self.thread = None
+        self.running = False
+
+    def add(self, name, target, *args, final_exitcodes=()):
+        stage = _Stage(name, target, args + (self.stop_event,), final_exitcodes)
+        stage.backoff = min(stage.backoff, self.max_backoff)
+        self.stages.append(stage)
+
+    def start(self):
+        self.running = True
+        for stage in self.stages:
+            self._spawn(stage)
+        self.thread = threading.Thread(target=self._monitor, daemon=True, name='pipeline-supervisor')
+        self.thread.start()
+
+    def _spawn(self, stage):
+        stage.process = self.context.Process(target=stage.target, args=stage.args, daemon=True,
+                                             name=f"pipeline-{stage.name}")
+        stage.process.start()
+        stage.started = time.monotonic()
+
+    def _monitor(self):
+        while self.running:
+            now = time.monotonic()
+            for stage in self.stages:
+                if not self.running or stage.failed or stage.process.is_alive():
+                    continue
+                if stage.process.exitcode in stage.final_exitcodes:
+                    stage.failed = True
+                    logging.error(f"Pipeline stage {stage.name} exited with code {stage.process.exitcode}, "
+                                  f"not restarting it")
+                elif stage.next_start == 0.0:
+                    if now - stage.started > 60.0:
+                        stage.backoff = 1.0
+                    stage.next_start = now + stage.backoff
+                    logging.error(f"Pipeline stage {stage.name} exited with code {stage.process.exitcode}, "
+                                  f"restarting in {stage.backoff:.1f}s")
+                    stage.backoff = min(stage.backoff * 2, self.max_backoff)
+                elif now >= stage.next_start:
+                    stage.next_start = 0.0
+                    stage.restarts += 1
+                    self._spawn(stage)
+            time.sleep(self.check_interval)
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+        for stage in self.stages:
+            if stage.process is None:
+                continue
+            stage.process.join(timeout)
+            if stage.process.is_alive():
+                stage.process.terminate()
+                stage.process.join(1.0)
+
+    def status(self):
+        return {stage.name: {'alive': stage.process is not None and stage.process.is_alive(),
+                             'pid': stage.process.pid if stage.process else None,
+                             'exitcode': stage.process.exitcode if stage.process else None,
+                             'restarts': stage.restarts,
+                             'failed': stage.failed}
+                for stage in self.stages}
+
+
+class ProcessPipelineRunner:
+    """
+    Multi-process drop-in for ``AsyncMultiCameraRunner``.
+
+    Every camera is captured in its own process and inference runs in
+    ``inference_workers`` processes, each serving a share of the cameras.
+    Frames and keypoints move between stages through ``SharedRing``s, never
+    pickled. This process only copies keypoint records out of the pose rings
+    (on a reader thread woken by the inference stages) for detection and
+    persistence, and hands them out with ``next_result`` as
+    ``(camera_id, frame_id, timestamp, None, pose)``: the frame itself stays
+    in the capture ring. A ``PipelineSupervisor`` restarts crashed stages.
+    """
+
+    def __init__(self, camera_ids=None, inference_workers=None, max_persons=None, slots=None, max_pending=32):
+        self.camera_ids = list(camera_ids or Config.CAMERA_IDS or [0])
+        self.inference_workers = max(1, min(inference_workers or Config.PIPELINE_INFERENCE_WORKERS,
+                                            len(self.camera_ids)))
+        self.max_persons = max_persons or Config.PIPELINE_MAX_PERSONS
+        self.slots = slots or Config.PIPELINE_RING_SLOTS
+        self.context = multiprocessing.get_context('spawn')  # Safe with CUDA and threads
+        self.frame_rings = {}
+        self.pose_rings = {}
+        self.supervisor = None
+        self.poses_ready = None
+        self.pending = deque(maxlen=max_pending)
+        self.result_event = asyncio.Event()
+        self.reader = None
+        self.loop = None
+        self.running = False
+        self.stats = {camera_id: {'processed': 0, 'dropped': 0} for camera_id in self.camera_ids}
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        stop_event = self.context.Event()
+        self.poses_ready = self.context.Event()
+        self.supervisor = PipelineSupervisor(self.context, stop_event)
+        worker_cameras = [self.camera_ids[i::self.inference_workers] for i in range(self.inference_workers)]
+        for worker, camera_ids in enumerate(worker_cameras):
+            frames_ready = self.context.Event()
+            for camera_id in camera_ids:
+                self.frame_rings[camera_id] = SharedRing(frame_fields(Config.CAPTURE_HEIGHT, Config.CAPTURE_WIDTH),
+                                                         self.slots)
+                self.pose_rings[camera_id] = SharedRing(pose_fields(self.max_persons), self.slots)
+                self.supervisor.add(f"capture-{camera_id}", capture_stage, camera_id,
+                                    self.frame_rings[camera_id].spec, frames_ready,
+                                    final_exitcodes=(CAMERA_UNAVAILABLE,))
+            self.supervisor.add(f"inference-{worker}", inference_stage,
+                                {camera_id: self.frame_rings[camera_id].spec for camera_id in camera_ids},
+                                {camera_id: self.pose_rings[camera_id].spec for camera_id in camera_ids},
+                                frames_ready, self.poses_ready)
+        self.supervisor.start()
+        capturing = await asyncio.to_thread(self._wait_for_cameras, Config.PIPELINE_START_TIMEOUT)
+        for camera_id in self.camera_ids:
+            if camera_id not in capturing:
+                logging.warning(f"Camera {camera_id} failed to start")
+        if not capturing:
+            await self.stop()
+            return False
+        self.running = True
+        self.reader = threading.Thread(target=self._read_poses, daemon=True, name='pipeline-reader')
+        self.reader.start()
+        return True
+
+    def _wait_for_cameras(self, timeout):
+        """Cameras whose capture stage publishes a first frame within ``timeout`` seconds"""
+        deadline = time.monotonic() + timeout
+        capturing, waiting = set(), set(self.camera_ids)
+        while waiting and time.monotonic() < deadline:
+            stages = self.supervisor.status()
+            for camera_id in list(waiting):
+                if self.frame_rings[camera_id].write_seq > 0:
+                    capturing.add(camera_id)
+                    waiting.discard(camera_id)
+                elif stages[f"capture-{camera_id}"]['exitcode'] == CAMERA_UNAVAILABLE:
+                    waiting.discard(camera_id)
+            time.sleep(0.05)
+        return capturing
+
+    async def stop(self):
+        self.running = False
+        if self.supervisor:
+            await asyncio.to_thread(self.supervisor.stop)
+        if self.reader:
+            self.reader.join(1.0)
+            self.reader = None
+        for ring in list(self.frame_rings.values()) + list(self.pose_rings.values()):
+            ring.close()
+        self.frame_rings, self.pose_rings = {}, {}
+        self.result_event.set()
+
+    def _read_poses(self):
+        cursors = dict.fromkeys(self.pose_rings, 0)
+        while self.running:
+            self.poses_ready.wait(0.1)
+            self.poses_ready.clear()
+            results = []
+            for camera_id, ring in self.pose_rings.items():
+                latest = ring.write_seq
+                first = max(cursors[camera_id] + 1, latest - self.slots + 2)  # The oldest slot may be rewritten
+                self.stats[camera_id]['dropped'] += first - cursors[camera_id] - 1
+                for seq in range(first, latest + 1):
+                    record = ring.read(seq)
+                    if record is None:
+                        self.stats[camera_id]['dropped'] += 1
+                        continue
+                    count = int(record['count'][0])
+                    timestamp = float(record['timestamp'][0])
+                    frame_id = int(record['frame_seq'][0])
+                    pose = PoseFrame(record['keypoints'][:count], timestamp=timestamp,
+                                     camera_id=camera_id, frame_id=frame_id)
+                    results.append((timestamp, camera_id, frame_id, pose))
+                cursors[camera_id] = latest
+            if not results:
+                continue
+            results.sort(key=lambda result: result[0])
+            try:
+                self.loop.call_soon_threadsafe(self._push, results)
+            except RuntimeError:
+                break  # Event loop is gone
+
+    def _push(self, results):
+        for timestamp, camera_id, frame_id, pose in results:
+            if len(self.pending) == self.pending.maxlen:
+                self.stats[self.pending[0][0]]['dropped'] += 1
+            self.pending.append((camera_id, frame_id, timestamp, None, pose))
+        self.result_event.set()
+
+    async def next_result(self, timeout=None):
+        """Wait until ``timeout`` for the next keypoint record, oldest first"""
+        if not self.pending:
+            self.result_event.clear()
+            try:
+                await asyncio.wait_for(self.result_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if not self.pending:
+            return None
+        result = self.pending.popleft()
+        self.stats[result[0]]['processed'] += 1
+        return result
+
+    def health(self):
+        stages = self.supervisor.status() if self.supervisor else {}
+        return {camera_id: dict(self.stats[camera_id], pipeline='process',
+                                capture=stages.get(f"capture-{camera_id}"),
+                                inference=stages.get(f"inference-{i % self.inference_workers}"))
+                for i, camera_id in enumerate(self.camera_ids)}
@@ -1,6 +1,9 @@
 import numpy as np
 from collections import deque
 import time
+from app.utils.pose_utils import ARM_JOINTS
+
+REQUIRED_JOINTS = list(ARM_JOINTS['right'] + ARM_JOINTS['left'])
 
 class PunchDetector:
     def __init__(self):
@@ -17,7 +20,11 @@ class PunchDetector:
         self.direction_threshold = 30
         
     def detect_punch_type(self, keypoints, person_id, timestamp):
-        """Detect if a punch was thrown and classify its type."""
+        """
+        Detect if a punch was thrown and classify its type.
+
+        ``keypoints`` is one person's ``(17, 3)`` row of a PoseFrame.
+        """
 
         right_id = f"{person_id}_right"
         left_id = f"{person_id}_left"
@@ -38,18 +45,13 @@ class PunchDetector:
         if timestamp - self.last_punch_time.get(person_id, 0) < self.cooldown:
             return None
             
-        # Get relevant keypoints
-        keypoints_dict = self._get_named_keypoints(keypoints)
-        
         # Check if all required keypoints are present
-        required = ['right_shoulder', 'right_elbow', 'right_wrist', 
-                    'left_shoulder', 'left_elbow', 'left_wrist']
-        if not all(k in keypoints_dict and keypoints_dict[k][2] > 0.3 for k in required):
+        if not (keypoints[REQUIRED_JOINTS, 2] > 0.3).all():
             return None
             
         # Calculate punch data for both hands
-        right_punch_data = self._analyze_limb(keypoints_dict, 'right', right_id, timestamp)
-        left_punch_data = self._analyze_limb(keypoints_dict, 'left', left_id, timestamp)
+        right_punch_data = self._analyze_limb(keypoints, 'right', right_id, timestamp)
+        left_punch_data = self._analyze_limb(keypoints, 'left', left_id, timestamp)
         
         # Determine which punch (if any) was thrown
         if right_punch_data and left_punch_data:
@@ -74,9 +76,10 @@ class PunchDetector:
     def _analyze_limb(self, keypoints, side, tracking_id, timestamp):
         """Analyze a single arm to detect punches."""
 
-        shoulder = keypoints[f'{side}_shoulder']
-        elbow = keypoints[f'{side}_elbow']
-        wrist = keypoints[f'{side}_wrist']
+        shoulder_idx, elbow_idx, wrist_idx = ARM_JOINTS[side]
+        shoulder = keypoints[shoulder_idx]
+        elbow = keypoints[elbow_idx]
+        wrist = keypoints[wrist_idx]
         
         # Skip if any keypoint has low confidence
         if min(shoulder[2], elbow[2], wrist[2]) < 0.3:
@@ -156,9 +159,7 @@ class PunchDetector:
         direction = direction / np.linalg.norm(direction)
         
         # Get arm angle
-        shoulder = keypoints[f'{side}_shoulder'][:2]
-        elbow = keypoints[f'{side}_elbow'][:2]
-        wrist = keypoints[f'{side}_wrist'][:2]
+        shoulder, elbow, wrist = keypoints[list(ARM_JOINTS[side]), :2]
         
         # Calculate elbow angle
         elbow_angle = self._calculate_angle(shoulder, elbow, wrist)
@@ -193,18 +194,191 @@ class PunchDetector:
         cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
         angle = np.arccos(np.clip(cosine, -1.0, 1.0))
         return np.degrees(angle)
-        
-    def _get_named_keypoints(self, keypoints):
-        """Convert numeric keypoints to named keypoints."""
-
-        return {
-            'nose': keypoints[0],
-            'right_shoulder': keypoints[5],
-            'left_shoulder': keypoints[6],
-            'right_elbow': keypoints[7],
-            'left_elbow': keypoints[8],
-            'right_wrist': keypoints[9],
-            'left_wrist': keypoints[10],
-            'right_hip': keypoints[11],
-            'left_hip': keypoints[12],
-        }
\ No newline at end of file
+
+
+PUNCH_CLASSES = ["Uppercut", "Straight", "Hook", "Jab", "Other"]
+SIDES = ("right", "left")
+WRISTS = [ARM_JOINTS[side][2] for side in SIDES]
+SHOULDERS = [ARM_JOINTS[side][0] for side in SIDES]
+ELBOWS = [ARM_JOINTS[side][1] for side in SIDES]
+
+
+class VectorizedPunchDetector:
+    """
+    Array-based engine with the same rules and thresholds as PunchDetector.
+
+    Kinematic state lives in preallocated NumPy arrays with one slot per
+    tracked person and one row per arm: the last wrist position and time, a
+    ring of the last 5 velocities and the last 3 accelerations. ``detect_frame``
+    scores every (person, arm) pair of a PoseFrame with array operations and
+    returns the same punches PunchDetector would for the same input.
+    """
+
+    def __init__(self, capacity=16):
+        self.cooldown = 0.5
+        self.speed_threshold = 0.7
+        self.velocity_threshold = 0.5
+        self.acceleration_threshold = 0.3
+        self.direction_threshold = 30
+        self.velocity_window = 5
+        self.acceleration_window = 3
+
+        self.slots = {}  # Track key -> slot index
+        self.free_slots = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Create (or grow to ``capacity``) the per-slot state arrays"""
+        old = getattr(self, 'capacity', 0)
+        fields = {
+            'last_position': (capacity, 2, 2),
+            'last_time': (capacity, 2),
+            'positions_seen': (capacity, 2),
+            'last_velocity': (capacity, 2, 2),
+            'velocities': (capacity, 2, self.velocity_window, 2),
+            'velocity_count': (capacity, 2),
+            'accelerations': (capacity, 2, self.acceleration_window, 2),
+            'acceleration_count': (capacity, 2),
+            'last_punch_time': (capacity,),
+        }
+        for name, shape in fields.items():
+            dtype = np.int64 if name.endswith(('count', 'seen')) else np.float64
+            array = np.zeros(shape, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.free_slots.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def _slot(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            if not self.free_slots:
+                self._allocate(self.capacity * 2)
+            slot = self.slots[key] = self.free_slots.pop()
+        return slot
+
+    def evict(self, keys):
+        """Forget the state of tracks that have left"""
+        for key in keys:
+            slot = self.slots.pop(key, None)
+            if slot is None:
+                continue
+            for name in ('last_position', 'last_time', 'positions_seen', 'last_velocity', 'velocities',
+                         'velocity_count', 'accelerations', 'acceleration_count', 'last_punch_time'):
+                getattr(self, name)[slot] = 0
+            self.free_slots.append(slot)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def detect_frame(self, pose, keys=None):
+        """
+        Detect punches for everyone in ``pose`` at once.
+
+        ``keys`` identify each row's track (default: ``(camera_id, track_id)``).
+        Returns a list of ``(row, punch_data)`` in row order.
+        """
+        if not len(pose):
+            return []
+        if keys is None:
+            keys = [(pose.camera_id, track_id) for track_id in pose.track_ids.tolist()]
+        timestamp = pose.timestamp
+        slots = np.fromiter((self._slot(key) for key in keys), dtype=np.int64, count=len(keys))
+        keypoints = pose.keypoints
+
+        # Rows out of cooldown with every arm joint confidently detected
+        active = (timestamp - self.last_punch_time[slots] >= self.cooldown) & \
+                 (keypoints[:, REQUIRED_JOINTS, 2] > 0.3).all(axis=1)
+        rows = np.flatnonzero(active)
+        if not len(rows):
+            return []
+        slots = slots[rows]
+        keypoints = keypoints[rows]
+
+        # Push the wrist positions, per (person, arm)
+        wrist = keypoints[:, WRISTS, :2].astype(np.float64)
+        has_previous = self.positions_seen[slots] > 0
+        dt = timestamp - self.last_time[slots]
+        delta = wrist - self.last_position[slots]
+        self.last_position[slots] = wrist
+        self.last_time[slots] = timestamp
+        self.positions_seen[slots] = np.minimum(self.positions_seen[slots] + 1, 2)
+
+        moved = has_previous & (dt > 0)
+        person_idx, side_idx = np.nonzero(moved)
+        if not len(person_idx):
+            return []
+        pair_slots = slots[person_idx]
+        dt = dt[person_idx, side_idx, None]
+        delta = delta[person_idx, side_idx]
+
+        # Velocity and acceleration rings
+        velocity = delta / dt
+        speed = np.linalg.norm(velocity, axis=1)
+        had_velocity = (self.velocity_count[pair_slots, side_idx] > 0)[:, None]
+        acceleration = np.where(had_velocity, (velocity - self.last_velocity[pair_slots, side_idx]) / dt, 0.0)
+        self.last_velocity[pair_slots, side_idx] = velocity
+        avg_velocity = self._push(self.velocities, self.velocity_count, pair_slots, side_idx, velocity)
+        avg_acceleration = self._push(self.accelerations, self.acceleration_count,
+                                      pair_slots, side_idx, acceleration)
+
+        velocity_norm = np.linalg.norm(avg_velocity, axis=1)
+        acceleration_norm = np.linalg.norm(avg_acceleration, axis=1)
+        distance = np.linalg.norm(delta, axis=1)
+        candidate = (speed >= self.speed_threshold) & \
+                    (velocity_norm >= self.velocity_threshold) & \
+                    (acceleration_norm >= self.acceleration_threshold) & \
+                    (distance >= 5)
+        if not candidate.any():
+            return []
+
+        # Classify, with the rules checked in PunchDetector._classify_punch order
+        arm_keypoints = keypoints[person_idx]
+        shoulder = arm_keypoints[np.arange(len(side_idx)), np.take(SHOULDERS, side_idx), :2]
+        elbow = arm_keypoints[np.arange(len(side_idx)), np.take(ELBOWS, side_idx), :2]
+        ba = shoulder - elbow
+        bc = wrist[person_idx, side_idx] - elbow
+        cosine = (ba * bc).sum(axis=1) / (np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1) + 1e-6)
+        elbow_angle = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        direction = delta / np.where(distance > 0, distance, 1.0)[:, None]
+        direction_x, direction_y = np.abs(direction[:, 0]), direction[:, 1]
+        punch_class = np.select([
+            (direction_y < -0.7) & (avg_acceleration[:, 1] < -0.2),
+            (elbow_angle > 140) & (direction_x > 0.7) & (np.abs(avg_acceleration[:, 0]) < 0.2),
+            (elbow_angle < 90) & (direction_x > 0.3) & (np.abs(direction_y) > 0.3),
+            (elbow_angle > 120) & (direction_x > 0.7) & (velocity_norm > self.velocity_threshold),
+        ], [0, 1, 2, 3], default=4)
+
+        # One punch per person: the arm with the most combined motion, left on ties
+        motion = np.where(candidate, speed + velocity_norm + acceleration_norm, -np.inf)
+        best = {}
+        for pair in np.flatnonzero(candidate).tolist():
+            person = int(person_idx[pair])
+            current = best.get(person)
+            if current is None or (motion[pair] > motion[current] if side_idx[pair] == 0
+                                   else motion[pair] >= motion[current]):
+                best[person] = pair
+
+        punches = []
+        for person, pair in sorted(best.items()):
+            self.last_punch_time[slots[person]] = timestamp
+            side = SIDES[side_idx[pair]]
+            punches.append((int(rows[person]), {
+                'type': f"{PUNCH_CLASSES[punch_class[pair]]} {side.capitalize()}",
+                'timestamp': timestamp,
+                'speed': float(speed[pair]),
+                'velocity': avg_velocity[pair],
+                'acceleration': avg_acceleration[pair],
+                'power': float(speed[pair]) * 1.2
+            }))
+        return punches
+
+    @staticmethod
+    def _push(ring, count, slots, sides, values):
+        """Append ``values`` to each pair's ring; return the mean over its filled entries"""
+        window = ring.shape[2]
+        ring[slots, sides, count[slots, sides] % window] = values
+        count[slots, sides] += 1
+        filled = np.minimum(count[slots, sides], window)[:, None]
+        return ring[slots, sides].sum(axis=1) / filled
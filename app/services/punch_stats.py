@@ -0,0 +1,103 @@
+from sqlalchemy import case, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.models.models import db, PunchData, PunchStat
+
+
+def _deltas(rows):
+    """Sum punch rows into ``(session, fighter, type) -> [count, speed_sum, speed_max, power_sum]``"""
+    deltas = {}
+    for row in rows:
+        key = (row['session_id'], row['fighter_id'], row['punch_type'])
+        speed = row['speed'] or 0.0
+        delta = deltas.get(key)
+        if delta is None:
+            deltas[key] = [1, speed, speed, row.get('power') or 0.0]
+        else:
+            delta[0] += 1
+            delta[1] += speed
+            delta[2] = max(delta[2], speed)
+            delta[3] += row.get('power') or 0.0
+    return deltas
+
+
+def _upsert(connection, table):
+    """INSERT that adds onto an existing rollup row instead of conflicting with it"""
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        new = statement.inserted
+    else:
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        new = statement.excluded
+    values = {
+        'count': table.c.count + new.count,
+        'speed_sum': table.c.speed_sum + new.speed_sum,
+        'speed_max': case((table.c.speed_max < new.speed_max, new.speed_max), else_=table.c.speed_max),
+        'power_sum': table.c.power_sum + new.power_sum,
+    }
+    if dialect == 'mysql':
+        return statement.on_duplicate_key_update(**values)
+    return statement.on_conflict_do_update(index_elements=['session_id', 'fighter_id', 'punch_type'], set_=values)
+
+
+def apply_punch_stats(connection, rows):
+    """
+    Add freshly inserted punch rows to the ``punch_stats`` rollup.
+
+    Call it on the connection that inserted ``rows``, in the same
+    transaction, so the rollup never drifts from ``punch_data``. It is one
+    executemany upsert (ON CONFLICT / ON DUPLICATE KEY UPDATE) that bumps
+    existing rows in place, so a row created concurrently by someone else
+    adds up instead of failing the batch on the unique constraint.
+    """
+    deltas = _deltas(rows)
+    if not deltas:
+        return 0
+    connection.execute(_upsert(connection, PunchStat.__table__), [
+        {'session_id': session_id, 'fighter_id': fighter_id, 'punch_type': punch_type, 'count': count,
+         'speed_sum': speed_sum, 'speed_max': speed_max, 'power_sum': power_sum}
+        for (session_id, fighter_id, punch_type), (count, speed_sum, speed_max, power_sum) in deltas.items()
+    ])
+    return len(deltas)
+
+
+def rebuild_punch_stats(session_id=None):
+    """
+    Recompute the rollup from ``punch_data`` for one session, or for every
+    session when none is given. Must run inside an application context, and
+    only for sessions the persistence thread no longer writes to: its
+    increments would be lost to the delete.
+    """
+    table = PunchStat.__table__
+    punches = PunchData.__table__
+    totals = db.select(
+        punches.c.session_id, punches.c.fighter_id, punches.c.punch_type,
+        func.count(), func.coalesce(func.sum(punches.c.speed), 0.0), func.coalesce(func.max(punches.c.speed), 0.0),
+        func.coalesce(func.sum(punches.c.power), 0.0)
+    ).group_by(punches.c.session_id, punches.c.fighter_id, punches.c.punch_type)
+    delete = table.delete()
+    if session_id is not None:
+        totals = totals.where(punches.c.session_id == session_id)
+        delete = delete.where(table.c.session_id == session_id)
+    with db.engine.begin() as connection:
+        connection.execute(delete)
+        result = connection.execute(table.insert().from_select(
+            ['session_id', 'fighter_id', 'punch_type', 'count', 'speed_sum', 'speed_max', 'power_sum'], totals))
+    return result.rowcount
+
+
+def summarize_punch_stats(rows):
+    """Per-fighter totals from a session's ``punch_stats`` rows"""
+    stats = {}
+    for row in rows:
+        fighter = stats.setdefault(row.fighter_id, {'total_punches': 0, 'punch_types': {}, 'max_speed': 0.0,
+                                                    'speed_sum': 0.0, 'total_power': 0.0})
+        fighter['total_punches'] += row.count
+        fighter['punch_types'][row.punch_type] = row.count
+        fighter['max_speed'] = max(fighter['max_speed'], row.speed_max)
+        fighter['speed_sum'] += row.speed_sum
+        fighter['total_power'] += row.power_sum
+    for fighter in stats.values():
+        speed_sum = fighter.pop('speed_sum')
+        fighter['avg_speed'] = speed_sum / fighter['total_punches'] if fighter['total_punches'] else 0.0
+    return stats
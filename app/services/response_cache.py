@@ -0,0 +1,160 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, g, make_response, request
+from app.config import Config
+
+FOREVER = None  # ``ttl`` of responses that never expire, only get invalidated
+
+
+class _Entry:
+    __slots__ = ('body', 'mimetype', 'etag', 'expires', 'tags')
+
+    def __init__(self, body, mimetype, etag, expires, tags):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.expires = expires
+        self.tags = tags
+
+
+class ResponseCache:
+    """
+    In-process LRU of serialized GET responses.
+
+    Entries are bounded by count (``max_entries``) and total body size
+    (``max_bytes``), evicting the least recently used first, and expire after
+    ``ttl`` seconds unless stored with ``FOREVER``. Every entry carries tags
+    such as ``fighter:3`` or ``session:12``; write paths call ``invalidate``
+    with the tags they touched and exactly the responses built from that
+    data are dropped, so nothing stale is served even before the TTL.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_SIZE
+        self.max_bytes = max_bytes or Config.RESPONSE_CACHE_MAX_BYTES
+        self.ttl = ttl or Config.RESPONSE_CACHE_TTL
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> _Entry, least recently used first
+        self.by_tag = {}  # tag -> keys
+        self.size = 0
+        self.generation = 0  # Bumped by every invalidation
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evicted': 0, 'invalidated': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, body, mimetype, tags, ttl=0, generation=None):
+        """
+        Store a response body; ``ttl`` 0 uses the default, ``FOREVER`` never
+        expires. Pass the ``generation`` read before building the body to skip
+        storing it if an invalidation happened meanwhile.
+        """
+        if len(body) > self.max_bytes:
+            return None
+        if ttl == 0:
+            ttl = self.ttl
+        entry = _Entry(body, mimetype, hashlib.sha1(body).hexdigest(),
+                       None if ttl is FOREVER else time.monotonic() + ttl, frozenset(tags))
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return None  # Possibly built from data that just changed
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += len(body)
+            for tag in entry.tags:
+                self.by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats['evicted'] += 1
+        return entry
+
+    def invalidate(self, *tags):
+        """Drop every response tagged with any of ``tags``"""
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self.by_tag.get(tag, ())):
+                    self._remove(key)
+                    self.stats['invalidated'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_tag.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self.by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_tag[tag]
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.size)
+
+
+response_cache = ResponseCache()
+
+
+def add_cache_tags(*tags):
+    """Tag the response of the current ``cached`` view with more data it was built from"""
+    g.cache_tags = g.get('cache_tags', ()) + tags
+
+
+def cache_forever():
+    """Keep the response of the current ``cached`` view until it is invalidated"""
+    g.cache_ttl = FOREVER
+
+
+def cached(*tags):
+    """
+    Serve a GET view from the response cache, with ETag / If-None-Match.
+
+    ``tags`` are formatted with the view's arguments, e.g.
+    ``cached('fighter:{fighter_id}')``; the view may add more with
+    ``add_cache_tags`` and opt out of expiry with ``cache_forever``. Only 200
+    responses are stored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            key = request.full_path
+            entry = response_cache.get(key)
+            if entry is None:
+                generation = response_cache.generation
+                response = make_response(view(**kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = response_cache.put(key, response.get_data(), response.mimetype,
+                                           [tag.format(**kwargs) for tag in tags] + list(g.get('cache_tags', ())),
+                                           g.get('cache_ttl', 0), generation)
+                if entry is None:
+                    response.add_etag()
+                    return response.make_conditional(request)
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                response_cache.stats['not_modified'] += 1
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from app.config import Config
+from app.services.combinations import CombinationAggregator
+from app.services.fight_analyzer import AsyncFightAnalyzer
+from app.services.inference_worker import BatchInferenceWorker
+from app.services.persistence import PersistenceWorker
+
+STARTING = 'starting'
+RUNNING = 'running'
+DRAINING = 'draining'
+ENDED = 'ended'
+
+
+class ManagedSession:
+    """One session, its analyzer and its scheduling state."""
+
+    def __init__(self, analyzer, camera_ids, priority, cpu_budget, ready_size):
+        self.session_id = None
+        self.analyzer = analyzer
+        self.camera_ids = camera_ids
+        self.priority = priority
+        self.cpu_budget = cpu_budget  # Seconds of frame processing per second, None for no limit
+        self.state = STARTING
+        self.ready = deque(maxlen=ready_size)  # Results waiting for a turn, oldest dropped first
+        self.fetch_task = None
+        self.pass_value = 0.0  # Stride scheduling: lowest goes next
+        self.cpu_used = 0.0  # In the current budget window
+        self.stats = {'processed': 0, 'cpu_seconds': 0.0, 'budget_throttled': 0, 'dropped': 0}
+
+    def status(self):
+        return dict(self.stats,
+                    session_id=self.session_id,
+                    state=self.state,
+                    cameras=self.camera_ids,
+                    priority=self.priority,
+                    cpu_budget=self.cpu_budget,
+                    ready=len(self.ready),
+                    cpu_seconds=round(self.stats['cpu_seconds'], 3))
+
+
+class SessionManager:
+    """
+    Runs many concurrent sessions, each on its own cameras, on one server.
+
+    All sessions live on a dedicated event-loop thread and share a single
+    inference worker, persistence writer and combination aggregator. Each
+    session has a fetch task that waits for its next inference result and
+    queues it; one scheduler task then hands out processing turns with
+    stride scheduling, so sessions with results waiting get turns in
+    proportion to their ``priority``. A session that used up its
+    ``cpu_budget`` (seconds of processing per ``budget_window``) waits for
+    the next window while its oldest queued results are dropped, and a
+    higher priority also lets its cameras keep more frames in flight on the
+    shared inference worker.
+
+    Sessions go from ``starting`` to ``running``; ``end_session`` drains
+    them (cameras stopped, queued results processed, punches and
+    combinations flushed) before they are ``ended``. The public methods are
+    thread-safe and block until the loop thread has done the work, so Flask
+    routes can call them directly.
+    """
+
+    def __init__(self, app, budget_window=1.0, ready_size=None):
+        self.app = app
+        self.budget_window = budget_window
+        self.ready_size = ready_size or Config.SESSION_READY_QUEUE
+        self.sessions = {}  # session_id -> ManagedSession
+        self.reserved_cameras = set()  # Cameras of sessions still starting
+        self.inference = BatchInferenceWorker()
+        self.writer = PersistenceWorker()
+        self.combinations = CombinationAggregator()
+        self.loop = None
+        self.thread = None
+        self.wakeup = None
+        self.scheduler_task = None
+        self.window_start = 0.0
+
+    def start(self):
+        """Start the event-loop thread"""
+        if self.thread is not None:
+            return
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True, name='session-manager')
+        self.thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.wakeup = asyncio.Event()
+        self.scheduler_task = self.loop.create_task(self._schedule())
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def _call(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def start_session(self, fighter_ids, camera_ids=None, priority=None, cpu_budget=None, timeout=30.0):
+        """
+        Start a session on ``camera_ids`` (the configured cameras by default)
+        and return its id; raises ValueError if a camera is already in use.
+        """
+        self.start()
+        return self._call(self._start_session(fighter_ids, camera_ids, priority, cpu_budget), timeout)
+
+    def end_session(self, session_id, timeout=60.0):
+        """Drain and end a session; False if it isn't running"""
+        return self._call(self._end_session(session_id), timeout)
+
+    def shutdown(self, timeout=60.0):
+        """End every session and stop the loop thread"""
+        if self.thread is None:
+            return
+        self._call(self._shutdown(), timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def status(self):
+        return {session_id: session.status() for session_id, session in list(self.sessions.items())}
+
+    def active_session_ids(self):
+        return [session_id for session_id, session in list(self.sessions.items()) if session.state == RUNNING]
+
+    def get_analyzer(self, session_id):
+        session = self.sessions.get(session_id)
+        return session.analyzer if session else None
+
+    def get_persistence_stats(self):
+        return dict(self.writer.stats, queue_depth=self.writer.queue_depth(),
+                    combinations=dict(self.combinations.stats))
+
+    async def _start_session(self, fighter_ids, camera_ids, priority, cpu_budget):
+        camera_ids = list(camera_ids or Config.CAMERA_IDS or [0])
+        in_use = self.reserved_cameras.union(*(session.camera_ids for session in self.sessions.values()))
+        busy = sorted(set(camera_ids) & in_use)
+        if busy:
+            raise ValueError(f"Cameras {busy} are already used by another session")
+
+        priority = priority or Config.SESSION_DEFAULT_PRIORITY
+        if cpu_budget is None:
+            cpu_budget = Config.SESSION_CPU_BUDGET
+        # Higher priority sessions may keep more frames on the shared inference worker
+        max_in_flight = max(1, round(Config.INFERENCE_MAX_IN_FLIGHT * priority))
+        analyzer = AsyncFightAnalyzer(camera_ids=camera_ids, inference=self.inference, writer=self.writer,
+                                      combinations=self.combinations, max_in_flight=max_in_flight)
+        session = ManagedSession(analyzer, camera_ids, priority, cpu_budget or None, self.ready_size)
+        self.reserved_cameras.update(camera_ids)
+        try:
+            await self.inference.start()
+            with self.app.app_context():
+                session.session_id = await analyzer.start_session(fighter_ids)
+        finally:
+            self.reserved_cameras.difference_update(camera_ids)
+
+        # New sessions start level with the least served running session
+        running = [s.pass_value for s in self.sessions.values() if s.state == RUNNING]
+        session.pass_value = min(running) if running else 0.0
+        session.state = RUNNING
+        self.sessions[session.session_id] = session
+        session.fetch_task = asyncio.create_task(self._fetch(session))
+        logging.info(f"Session {session.session_id} started on cameras {camera_ids} "
+                     f"(priority {priority}, cpu budget {cpu_budget})")
+        return session.session_id
+
+    async def _fetch(self, session):
+        """Wait for the session's inference results and queue them for a turn"""
+        runner = session.analyzer.camera_runner
+        try:
+            while session.state == RUNNING:
+                result = await runner.next_result(timeout=0.5)
+                if result is None:
+                    continue
+                if len(session.ready) == session.ready.maxlen:
+                    session.stats['dropped'] += 1
+                session.ready.append(result)
+                self.wakeup.set()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"Result fetching failed for session {session.session_id}: {e}", exc_info=True)
+
+    def _over_budget(self, session):
+        return session.cpu_budget is not None and session.cpu_used >= session.cpu_budget * self.budget_window
+
+    async def _schedule(self):
+        """Give processing turns to sessions with queued results, lowest pass value first"""
+        self.window_start = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - self.window_start >= self.budget_window:
+                self.window_start = now
+                for session in self.sessions.values():
+                    session.cpu_used = 0.0
+
+            candidates = [s for s in self.sessions.values()
+                          if s.ready and s.state in (RUNNING, DRAINING) and not self._over_budget(s)]
+            if not candidates:
+                self.wakeup.clear()
+                # Results may be waiting on a spent budget: retry when the window rolls over
+                waiting = any(s.ready for s in self.sessions.values())
+                timeout = max(0.0, self.window_start + self.budget_window - now) if waiting else None
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            session = min(candidates, key=lambda s: s.pass_value)
+            result = session.ready.popleft()
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    await session.analyzer.process_result(session.session_id, result)
+            except Exception as e:
+                logging.error(f"Error processing a frame of session {session.session_id}: {e}", exc_info=True)
+            elapsed = time.perf_counter() - started
+            session.cpu_used += elapsed
+            if self._over_budget(session):
+                session.stats['budget_throttled'] += 1  # Windows in which the budget ran out
+            session.pass_value += elapsed / session.priority
+            session.stats['processed'] += 1
+            session.stats['cpu_seconds'] += elapsed
+            await asyncio.sleep(0)  # Let fetch tasks and the inference worker run between turns
+
+    async def _end_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None or session.state != RUNNING:
+            return False
+        session.state = DRAINING
+        if session.fetch_task:
+            session.fetch_task.cancel()
+            await asyncio.gather(session.fetch_task, return_exceptions=True)
+        # Queued results are processed by the scheduler as usual, budget allowing
+        while session.ready:
+            self.wakeup.set()
+            await asyncio.sleep(0.01)
+        try:
+            with self.app.app_context():
+                await session.analyzer.end_session(session_id)
+        except Exception as e:
+            # Its event log stays on disk and is replayed by recover_event_logs on the next start
+            logging.error(f"Error ending session {session_id}: {e}", exc_info=True)
+            if session.analyzer.camera_runner.running:
+                await session.analyzer.camera_runner.stop()
+            raise
+        finally:
+            # Ended either way, so its cameras are free again
+            session.state = ENDED
+            del self.sessions[session_id]
+        logging.info(f"Session {session_id} ended: {session.status()}")
+        return True
+
+    async def _shutdown(self):
+        for session_id in list(self.sessions):
+            try:
+                await self._end_session(session_id)
+            except Exception:
+                pass  # Logged by _end_session; end the others regardless
+        self.scheduler_task.cancel()
+        await self.inference.stop()
+        await asyncio.to_thread(self.writer.stop)
@@ -0,0 +1,106 @@
+import itertools
+import numpy as np
+from app.config import Config
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional; fall back to greedy matching
+    linear_sum_assignment = None
+
+
+def keypoint_boxes(keypoints, min_confidence=0.3):
+    """``(persons, 4)`` x0, y0, x1, y1 boxes around each person's visible keypoints"""
+    visible = keypoints[:, :, 2] > min_confidence
+    xs, ys = keypoints[:, :, 0], keypoints[:, :, 1]
+    boxes = np.stack([np.where(visible, xs, np.inf).min(axis=1), np.where(visible, ys, np.inf).min(axis=1),
+                      np.where(visible, xs, -np.inf).max(axis=1), np.where(visible, ys, -np.inf).max(axis=1)],
+                     axis=1)
+    boxes[~visible.any(axis=1)] = 0  # Nobody visible: an empty box matches nothing
+    return boxes
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between ``(n, 4)`` and ``(m, 4)`` boxes"""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.where(union > 0, union, 1), 0.0)
+
+
+def _greedy_assignment(cost):
+    rows, cols = [], []
+    for flat in np.argsort(cost, axis=None):
+        row, col = np.unravel_index(flat, cost.shape)
+        if row not in rows and col not in cols:
+            rows.append(row)
+            cols.append(col)
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+class PoseTracker:
+    """
+    Gives detections stable track ids across frames.
+
+    Detections are matched to live tracks by the IoU of their keypoint boxes,
+    with an optimal assignment (Hungarian, via scipy when installed) and a
+    minimum IoU of ``iou_threshold``. Unmatched detections open new tracks and
+    tracks unseen for ``idle_timeout`` seconds are evicted, so anything keyed
+    by track id can be freed as soon as the person is gone.
+    """
+
+    def __init__(self, iou_threshold=None, idle_timeout=None):
+        self.iou_threshold = iou_threshold if iou_threshold is not None else Config.TRACK_IOU_THRESHOLD
+        self.idle_timeout = idle_timeout if idle_timeout is not None else Config.TRACK_IDLE_TIMEOUT
+        self.next_id = itertools.count()
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4))
+        self.last_seen = np.zeros(0)
+
+    @property
+    def live_tracks(self):
+        return len(self.track_ids)
+
+    def update(self, pose):
+        """
+        Assign track ids to ``pose`` in place.
+
+        Returns the ids of the tracks evicted by this update.
+        """
+        boxes = keypoint_boxes(pose.keypoints)
+        assigned = np.full(len(pose), -1, dtype=np.int64)
+
+        if len(pose) and self.live_tracks:
+            cost = 1.0 - iou_matrix(self.boxes, boxes)
+            assign = linear_sum_assignment or _greedy_assignment
+            track_rows, detection_rows = assign(cost)
+            keep = cost[track_rows, detection_rows] <= 1.0 - self.iou_threshold
+            track_rows, detection_rows = track_rows[keep], detection_rows[keep]
+            assigned[detection_rows] = self.track_ids[track_rows]
+            self.boxes[track_rows] = boxes[detection_rows]
+            self.last_seen[track_rows] = pose.timestamp
+
+        new = np.flatnonzero(assigned < 0)
+        if len(new):
+            new_ids = np.fromiter((next(self.next_id) for _ in new), dtype=np.int64, count=len(new))
+            assigned[new] = new_ids
+            self.track_ids = np.concatenate([self.track_ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new), pose.timestamp)])
+
+        pose.track_ids = assigned
+        return self._evict_idle(pose.timestamp)
+
+    def _evict_idle(self, now):
+        idle = now - self.last_seen > self.idle_timeout
+        if not idle.any():
+            return []
+        evicted = self.track_ids[idle].tolist()
+        self.track_ids = self.track_ids[~idle]
+        self.boxes = self.boxes[~idle]
+        self.last_seen = self.last_seen[~idle]
+        return evicted
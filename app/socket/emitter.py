@@ -0,0 +1,341 @@
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from app.config import Config
+from app.services.event_bus import event_bus, PUNCH, COMBINATION, SESSION
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; clients asking for it get JSON
+    msgpack = None
+
+# Column order of the rows in a batch, sent to clients with the fighter names
+PUNCH_FIELDS = ['fighter_id', 'punch_type', 'timestamp', 'speed', 'power', 'hit_landed']
+COMBO_FIELDS = ['fighter_id', 'sequence', 'frequency', 'start_time', 'end_time']
+ENCODINGS = ('json', 'msgpack')
+ALL_SESSIONS = '*'
+
+
+def session_room(session_id, encoding):
+    """Socket.IO room of a session's viewers; ``ALL_SESSIONS`` for viewers of every session"""
+    return f"session:{session_id}:{encoding}"
+
+
+def _merge(batches):
+    merged = {'session_id': batches[-1]['session_id'], 'seq': batches[-1]['seq'], 'punches': [], 'combos': []}
+    for batch in batches:
+        merged['punches'].extend(batch['punches'])
+        merged['combos'].extend(batch['combos'])
+    return merged
+
+
+class _SessionFeed:
+    """Sequence cursor, recent batches and fighter names of one session."""
+    __slots__ = ('session_id', 'seq', 'history', 'fighter_names')
+
+    def __init__(self, session_id, history):
+        self.session_id = session_id
+        self.seq = 0  # Sequence number of the last batch
+        self.history = deque(maxlen=history)
+        self.fighter_names = {}
+
+    def since(self, seq):
+        return [batch for batch in self.history if batch['seq'] > seq]
+
+
+class _Client:
+    __slots__ = ('sid', 'encoding', 'rate', 'tokens', 'last_refill', 'backlog', 'sessions', 'lagging', 'unacked',
+                 'dropped', 'sent')
+
+    def __init__(self, sid, encoding, rate, backlog):
+        self.sid = sid
+        self.encoding = encoding
+        self.rate = rate
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.backlog = deque(maxlen=backlog)  # Batches waiting for a send slot, oldest dropped first
+        self.sessions = set()  # Subscribed session ids, or ALL_SESSIONS
+        self.lagging = False  # Taken out of the rooms until it acknowledges everything
+        self.unacked = 0  # Messages sent with an acknowledgement callback, not acknowledged yet
+        self.dropped = 0
+        self.sent = 0
+
+    def wants(self, session_id):
+        return ALL_SESSIONS in self.sessions or session_id in self.sessions
+
+    def take_token(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class SocketEmitter:
+    """
+    Coalesced, compact emission of live events to dashboard clients.
+
+    Every ``tick`` seconds the events each session published on the bus since
+    the last tick become one numbered batch: punches and combinations as rows
+    of bare values (``PUNCH_FIELDS``/``COMBO_FIELDS``) with fighter names left
+    out. Clients subscribe to the sessions they watch (or all of them) and
+    get a ``fighters`` message with the session's names when they subscribe
+    and whenever a new fighter appears.
+
+    Each session maps to one Socket.IO room per encoding, so a batch is
+    encoded once (msgpack for clients that asked for it, when installed) and
+    fanned out by a single emit however many viewers there are. Every session
+    keeps its own sequence cursor and its last ``history`` batches; a client
+    that subscribes with ``since`` gets the batches after that cursor before
+    it joins the room, so switching or reconnecting neither skips nor
+    replays events. Clients limited to fewer messages per second than the
+    tick rate are served individually from a bounded backlog that drops its
+    oldest batch, merged into their next message; a message is only sent
+    while fewer than ``max_pending`` of the client's messages are still
+    unacknowledged. Room viewers get an acknowledged ``lag_probe`` every
+    tick; one that leaves ``max_pending`` of them unanswered is moved onto
+    the same path, and back into its rooms once it has acknowledged
+    everything.
+    """
+
+    def __init__(self, socketio, bus=None, tick=None, client_rate=None, client_backlog=None, history=None,
+                 max_pending=None):
+        self.socketio = socketio
+        self.bus = bus or event_bus
+        self.tick = tick or Config.SOCKET_TICK_MS / 1000.0
+        self.client_rate = client_rate or Config.SOCKET_CLIENT_RATE
+        self.client_backlog = client_backlog or Config.SOCKET_CLIENT_BACKLOG
+        self.history = history or Config.SOCKET_SESSION_HISTORY
+        self.max_pending = max_pending or Config.SOCKET_CLIENT_MAX_PENDING
+        self.lock = threading.RLock()
+        self.clients = {}
+        self.feeds = {}  # session_id -> _SessionFeed
+        self.subscription = None
+        self.thread = None
+        self.running = False
+        self.stats = {'ticks': 0, 'messages': 0, 'events': 0, 'dropped_batches': 0, 'held_back': 0,
+                      'lagged': 0, 'caught_up': 0}
+
+    def add_client(self, sid, encoding='json', rate=None):
+        if encoding == 'msgpack' and msgpack is None:
+            logging.warning("msgpack is not installed, sending JSON instead")
+            encoding = 'json'
+        with self.lock:
+            previous = self.clients.get(sid)
+            client = self.clients[sid] = _Client(sid, encoding, rate or self.client_rate, self.client_backlog)
+            if previous is not None:  # Same subscriptions, possibly in other rooms
+                for session_id in previous.sessions:
+                    self._leave(previous, session_id)
+                    self.subscribe(sid, session_id)
+        return client
+
+    def remove_client(self, sid):
+        """Forget a disconnected client; Socket.IO drops its rooms itself"""
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def _throttled(self, client):
+        return client.lagging or client.rate < 1.0 / self.tick
+
+
+    def subscribe(self, sid, session_id=None, since=None):
+        """
+        Start sending ``session_id``'s batches (every session's when None)
+        to a client, first catching it up on the batches after ``since``.
+        """
+        with self.lock:
+            client = self.clients.get(sid) or self.add_client(sid)
+            session_id = ALL_SESSIONS if session_id is None else session_id
+            client.sessions.add(session_id)
+            if session_id == ALL_SESSIONS:
+                feeds = list(self.feeds.values())
+            else:
+                feeds = [self.feeds[session_id]] if session_id in self.feeds else []
+            for feed in feeds:
+                self._send(client, 'fighters', self._fighters_message(feed, feed.fighter_names))
+                missed = feed.since(since) if since is not None and session_id != ALL_SESSIONS else []
+                if missed:
+                    self._send(client, 'events', _merge(missed))
+            self._join(client, session_id)
+
+    def unsubscribe(self, sid, session_id=None):
+        with self.lock:
+            client = self.clients.get(sid)
+            session_id = ALL_SESSIONS if session_id is None else session_id
+            if client is not None and session_id in client.sessions:
+                client.sessions.discard(session_id)
+                self._leave(client, session_id)
+
+    def _join(self, client, session_id):
+        if not self._throttled(client):
+            self.socketio.server.enter_room(client.sid, session_room(session_id, client.encoding), namespace='/')
+
+    def _leave(self, client, session_id):
+        if not self._throttled(client):
+            self.socketio.server.leave_room(client.sid, session_room(session_id, client.encoding), namespace='/')
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.subscription = self.bus.subscribe([PUNCH, COMBINATION, SESSION])
+        self.thread = threading.Thread(target=self._run, daemon=True, name='socket-emitter')
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self.running:
+            next_tick += self.tick
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            try:
+                self._emit(self.subscription.get_all(0))
+            except Exception as e:
+                logging.error(f"Error emitting socket events: {e}", exc_info=True)
+
+    def _emit(self, events):
+        self.stats['ticks'] += 1
+        self.stats['events'] += len(events)
+        batches, new_names, ended = {}, {}, []
+        with self.lock:
+            self._check_lag()
+            for topic, event in events:
+                session_id = event['session_id']
+                feed = self.feeds.get(session_id)
+                if feed is None:
+                    feed = self.feeds[session_id] = _SessionFeed(session_id, self.history)
+                if topic == SESSION:
+                    if event['status'] == 'ended':
+                        ended.append(session_id)
+                    continue
+                fighter_id = event['fighter_id']
+                name = event.get('fighter_name', "Unknown")
+                if feed.fighter_names.get(fighter_id) != name:  # New fighter, or renamed mid-session
+                    feed.fighter_names[fighter_id] = name
+                    new_names.setdefault(session_id, {})[fighter_id] = name
+                batch = batches.get(session_id)
+                if batch is None:
+                    batch = batches[session_id] = {'session_id': session_id, 'seq': feed.seq + 1,
+                                                   'punches': [], 'combos': []}
+                if topic == PUNCH:
+                    batch['punches'].append([event[field] for field in PUNCH_FIELDS])
+                else:
+                    batch['combos'].append([event[field] for field in COMBO_FIELDS])
+
+            for session_id, batch in batches.items():
+                feed = self.feeds[session_id]
+                feed.seq = batch['seq']
+                feed.history.append(batch)
+                if session_id in new_names:
+                    self._broadcast(session_id, 'fighters', self._fighters_message(feed, new_names[session_id]))
+                self._broadcast(session_id, 'events', batch)
+            self._serve_throttled(batches, new_names)
+
+            for session_id in ended:
+                feed = self.feeds.pop(session_id)
+                message = {'session_id': session_id, 'seq': feed.seq}
+                self._broadcast(session_id, 'session_ended', message)
+                for client in self.clients.values():
+                    if self._throttled(client) and client.wants(session_id):
+                        self._send(client, 'session_ended', message)
+
+    def _broadcast(self, session_id, event, data):
+        """One emit per encoding, to the session's room and the room of every-session viewers"""
+        for encoding in ENCODINGS:
+            if encoding == 'msgpack' and msgpack is None:
+                continue
+            self.socketio.emit(event, self._encode(data, encoding), namespace='/',
+                               to=[session_room(session_id, encoding), session_room(ALL_SESSIONS, encoding)])
+            self.stats['messages'] += 1
+
+    def _check_lag(self):
+        """Move room viewers that fall behind onto the throttled path, and back once they catch up"""
+        for client in self.clients.values():
+            if client.rate < 1.0 / self.tick:
+                continue  # Throttled whatever its lag
+            if not client.lagging and client.unacked >= self.max_pending:
+                for session_id in client.sessions:
+                    self._leave(client, session_id)
+                client.lagging = True
+                self.stats['lagged'] += 1
+            elif client.lagging and client.unacked == 0:
+                if client.backlog:  # Everything it missed, before the room's next batch
+                    self._flush(client)
+                client.lagging = False
+                for session_id in client.sessions:
+                    self._join(client, session_id)
+                self.stats['caught_up'] += 1
+            if not client.lagging and client.unacked < self.max_pending:
+                # Queued behind the room's batches, so its answer shows how far behind the client is
+                self._send(client, 'lag_probe', {}, track=True)
+
+    def _serve_throttled(self, batches, new_names):
+        now = time.monotonic()
+        for client in self.clients.values():
+            if not self._throttled(client):
+                continue
+            for session_id, batch in batches.items():
+                if not client.wants(session_id):
+                    continue
+                if session_id in new_names:
+                    self._send(client, 'fighters', self._fighters_message(self.feeds[session_id],
+                                                                          new_names[session_id]))
+                if len(client.backlog) == client.backlog.maxlen:
+                    client.dropped += 1
+                    self.stats['dropped_batches'] += 1
+                client.backlog.append(batch)
+            if not client.backlog:
+                continue
+            if client.unacked >= self.max_pending:
+                self.stats['held_back'] += 1  # Still busy with earlier messages; keep merging
+                continue
+            if client.take_token(now):
+                self._flush(client)
+
+    def _flush(self, client):
+        """Send a client's backlog as one merged batch per session"""
+        by_session = {}
+        for batch in client.backlog:
+            by_session.setdefault(batch['session_id'], []).append(batch)
+        client.backlog.clear()
+        for session_batches in by_session.values():
+            self._send(client, 'events', _merge(session_batches), track=True)
+        client.sent += 1
+
+    def _fighters_message(self, feed, names):
+        return {
+            'session_id': feed.session_id,
+            'names': {str(fighter_id): name for fighter_id, name in names.items()},
+            'punch_fields': PUNCH_FIELDS,
+            'combo_fields': COMBO_FIELDS
+        }
+
+    def _send(self, client, event, data, track=False):
+        """Emit to one client; ``track`` counts the message as unacknowledged until the client acks it"""
+        callback = None
+        if track:
+            client.unacked += 1
+            callback = functools.partial(self._acked, client)
+        self.socketio.emit(event, self._encode(data, client.encoding), to=client.sid, namespace='/',
+                           callback=callback)
+        self.stats['messages'] += 1
+
+    def _acked(self, client, *args):
+        with self.lock:
+            client.unacked -= 1
+
+    def _encode(self, data, encoding):
+        if encoding == 'msgpack':
+            return msgpack.packb(data)
+        return data  # Socket.IO serializes JSON itself
@@ -28,12 +28,22 @@ const player2 = createPlayer("Player 2");
 //  Socket.IO Setup
 // =================================
 const socket = io(window.location.origin);
+const sessionParam = new URLSearchParams(window.location.search).get('session');
+const SESSION_ID = sessionParam ? Number(sessionParam) : null;
+let lastSeq = null; // Cursor of the last batch received for SESSION_ID
 
 // Event Handlers
 socket.on('connect', () => {
   console.log('Connected to server');
   updateStatusLabel('CONNECTED', 'green');
-  socket.emit('get_updates'); // Request initial data
+  // Binary batches when the msgpack decoder loaded, JSON otherwise. One
+  // ring's screen watches ?session=<id>; without it every session is shown.
+  // After a reconnect the server resends whatever came after lastSeq.
+  socket.emit('get_updates', {
+      encoding: window.MessagePack ? 'msgpack' : 'json',
+      session_id: SESSION_ID,
+      since: lastSeq
+  });
 });
 
 socket.on('disconnect', () => {
@@ -66,6 +76,10 @@ function updateLastPunchDisplay(punch) {
   document.getElementById("lastPunch").textContent = punch;
 }
 
+function updateLastComboDisplay(combo) {
+  document.getElementById("lastCombo").textContent = combo;
+}
+
 // =================================
 //  Chart Updates
 // =================================
@@ -138,20 +152,100 @@ const barChart = new Chart(document.getElementById("barChart").getContext("2d"),
 // =================================
 //  Socket.IO Message Handling
 // =================================
-socket.on('punch_data', (data) => {
+const fighterNames = {};
+let punchFields = [];
+let comboFields = [];
+let sessionEnded = false; // The watched session is over; nothing more will come
+
+function decode(data) {
+  if (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) {
+      return MessagePack.decode(data instanceof ArrayBuffer ? new Uint8Array(data) : data);
+  }
+  return data;
+}
+
+function toObject(fields, row) {
+  return Object.fromEntries(fields.map((field, i) => [field, row[i]]));
+}
+
+// Sent once per connection, and again only when new fighters appear
+socket.on('fighters', (message) => {
+  const data = decode(message);
+  Object.assign(fighterNames, data.names);
+  punchFields = data.punch_fields;
+  comboFields = data.combo_fields;
+});
+
+function handlePunch(data) {
   const punch = data.punch_type;
   const playerId = data.fighter_id % 2 === 0 ? 2 : 1;
   const player = playerId === 1 ? player1 : player2;
 
-  if (player.punches[punch] !== undefined) {
-      player.punches[punch]++;
-      player.total++;
-      if (data.hit_landed) player.hits++;
+  if (player.punches[punch] === undefined) return false;
+  player.punches[punch]++;
+  player.total++;
+  if (data.hit_landed) player.hits++;
+  updateLastPunchDisplay(punch);
+  return true;
+}
+
+function handleCombo(data) {
+  const name = fighterNames[data.fighter_id] || `Fighter ${data.fighter_id}`;
+  updateLastComboDisplay(`${name}: ${data.sequence} (x${data.frequency})`);
+}
 
+function resetView() {
+  for (const player of [player1, player2]) {
+      Object.assign(player, createPlayer(player.name));
+  }
+  updatePlayerStats(player1, "1");
+  updatePlayerStats(player2, "2");
+  updateLastPunchDisplay("None");
+  updateLastComboDisplay("None");
+  lineChart.data.labels = [];
+  lineChart.data.datasets.forEach(dataset => { dataset.data = []; });
+  lineChart.update();
+  updateBarChartData();
+}
+
+// Acknowledged so the server can tell how far behind this screen is
+socket.on('lag_probe', (message, ack) => {
+  if (ack) ack();
+});
+
+// One message per server tick with every punch and combination since the last
+socket.on('events', (message, ack) => {
+  if (ack) ack();
+  const batch = decode(message);
+  if (sessionEnded) return;
+  if (SESSION_ID !== null) {
+      if (lastSeq !== null && batch.seq <= lastSeq) return; // Already shown
+      lastSeq = batch.seq;
+  }
+  let changed = false;
+  for (const row of batch.punches) {
+      changed = handlePunch(toObject(punchFields, row)) || changed;
+  }
+  for (const row of batch.combos) {
+      handleCombo(toObject(comboFields, row));
+  }
+
+  if (changed) {
       updatePlayerStats(player1, "1");
       updatePlayerStats(player2, "2");
-      updateLastPunchDisplay(punch);
       updateLineChartData();
       updateBarChartData();
   }
+});
+
+// Sent once a session's data is all on disk
+socket.on('session_ended', (message) => {
+  const data = decode(message);
+  if (SESSION_ID !== null && data.session_id !== SESSION_ID) return;
+  updateStatusLabel(`SESSION ${data.session_id} ENDED`, 'gray');
+  if (SESSION_ID !== null) {
+      sessionEnded = true; // Keep the final numbers on screen
+  } else {
+      resetView(); // Start the next session from zero
+  }
 });
\ No newline at end of file
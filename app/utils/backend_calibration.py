@@ -0,0 +1,154 @@
+# app/utils/backend_calibration.py
+
+import hashlib
+import json
+import logging
+import os
+import statistics
+import time
+import cv2
+import numpy as np
+import torch
+from app.config import Config
+from app.utils.model_loader import available_backends, initialize_pose_model
+
+REFERENCE_IMGSZ = 640  # What the PyTorch model runs at by default
+
+
+def _cache_key(model_name, device, frame_digest):
+    # A new machine, torch build, size ladder, tolerance or reference frame invalidates the measurement
+    sizes = ','.join(map(str, Config.CALIBRATION_IMGSZ))
+    return (f"{model_name}|{device}|{os.cpu_count()}|{torch.__version__}|"
+            f"{sizes}|{Config.CALIBRATION_TOLERANCE}|{frame_digest or 'no-frame'}")
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _calibration_frame():
+    """The reference frame and a digest of its file, or ``(None, None)`` without one"""
+    if Config.CALIBRATION_FRAME:
+        try:
+            with open(Config.CALIBRATION_FRAME, 'rb') as f:
+                data = f.read()
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        except OSError:
+            frame = None
+        if frame is not None:
+            return frame, hashlib.sha1(data).hexdigest()
+        logging.warning(f"Could not read calibration frame {Config.CALIBRATION_FRAME}")
+    return None, None
+
+
+def _keypoints(result):
+    if result.keypoints is None:
+        return np.zeros((0, 17, 3), dtype=np.float32)
+    data = result.keypoints.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    # Order people left to right so the two runs line up
+    return data[np.argsort(data[:, :, 0].mean(axis=1))] if len(data) else data
+
+
+def keypoint_error(reference, candidate, frame_shape):
+    """Mean keypoint distance as a fraction of the frame diagonal, inf if people differ"""
+    if reference.shape != candidate.shape:
+        return float('inf')
+    if not len(reference):
+        return 0.0
+    visible = reference[:, :, 2] > 0.3
+    if not visible.any():
+        return 0.0
+    distances = np.linalg.norm(reference[:, :, :2] - candidate[:, :, :2], axis=2)
+    return float(distances[visible].mean() / np.hypot(*frame_shape[:2]))
+
+
+def _time_model(model, frame, imgsz, runs=5):
+    model(frame, verbose=False, imgsz=imgsz)  # Warm the input size
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = model(frame, verbose=False, imgsz=imgsz)[0]
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def _thread_choices():
+    cores = os.cpu_count() or 1
+    return sorted({1, 2, max(1, cores // 2), cores})
+
+
+def calibrate_pose_backend(model_name, device='cpu', force=False):
+    """
+    Pick the fastest backend, input size and thread count for this machine.
+
+    Every available backend is timed on the calibration frame at each size in
+    CALIBRATION_IMGSZ (and each thread count, for PyTorch, whose intra-op pool
+    is the only one we can size). Candidates whose keypoints drift from the
+    PyTorch reference by more than CALIBRATION_TOLERANCE are rejected. Without
+    a CALIBRATION_FRAME there is nothing to check accuracy against, so only
+    the backend and threads are picked and the model keeps its default input
+    size. The winner is cached in BACKEND_CACHE_PATH so later startups skip
+    all this.
+    """
+    frame, frame_digest = _calibration_frame()
+    key = _cache_key(model_name, device, frame_digest)
+    cache = _load_cache(Config.BACKEND_CACHE_PATH)
+    if key in cache and not force:
+        return cache[key]
+
+    if frame is None:
+        logging.warning("No calibration frame; keeping the default input size")
+        frame = np.zeros((360, 480, 3), dtype=np.uint8)
+        sizes = [REFERENCE_IMGSZ]
+    else:
+        sizes = Config.CALIBRATION_IMGSZ
+    default_threads = torch.get_num_threads()
+    reference_model, _ = initialize_pose_model(model_name, device)
+    reference = _keypoints(reference_model(frame, verbose=False, imgsz=REFERENCE_IMGSZ)[0])
+
+    candidates = []
+    for backend in available_backends():
+        model = reference_model if backend == 'torch' else initialize_pose_model(model_name, device, backend)[0]
+        for threads in (_thread_choices() if backend == 'torch' else [None]):
+            torch.set_num_threads(threads or default_threads)
+            for imgsz in sizes:
+                try:
+                    latency, result = _time_model(model, frame, imgsz)
+                except Exception as e:
+                    logging.warning(f"Calibration of {backend}@{imgsz} failed: {e}")
+                    continue
+                error = keypoint_error(reference, _keypoints(result), frame.shape)
+                logging.info(f"Calibration {backend} imgsz={imgsz} threads={threads}: "
+                             f"{latency * 1000:.1f} ms, keypoint error {error:.4f}")
+                if error <= Config.CALIBRATION_TOLERANCE:
+                    candidates.append((latency, backend, imgsz, threads))
+    torch.set_num_threads(default_threads)
+
+    if candidates:
+        latency, backend, imgsz, threads = min(candidates, key=lambda c: c[0])
+        if frame_digest is None:
+            imgsz = None
+    else:
+        latency, backend, imgsz, threads = None, 'torch', None, None
+    choice = {'backend': backend, 'imgsz': imgsz, 'threads': threads, 'latency': latency}
+    logging.info(f"Selected inference backend {choice}")
+
+    cache[key] = choice
+    try:
+        _save_cache(Config.BACKEND_CACHE_PATH, cache)
+    except OSError as e:
+        logging.warning(f"Could not cache backend calibration: {e}")
+    return choice
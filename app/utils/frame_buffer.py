@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Fixed pool of preallocated frame buffers shared between a capture thread
+    and its consumers.
+
+    The writer decodes straight into the next free slot and publishes it with a
+    monotonically increasing sequence number and its capture timestamp. Readers
+    get read-only views into the slot (no copy). A view stays valid until the
+    writer wraps around the ring, i.e. for ``slots - 1`` further frames;
+    ``valid(seq)`` tells a reader that held on to one whether it still is.
+    """
+
+    def __init__(self, shape, slots=8, dtype=np.uint8):
+        if slots < 2:
+            raise ValueError("FrameRingBuffer needs at least 2 slots")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frames = np.zeros((slots,) + self.shape, dtype=dtype)
+        self.seqs = np.zeros(slots, dtype=np.int64)
+        self.timestamps = np.zeros(slots, dtype=np.float64)
+        self.write_seq = 0  # Sequence number of the last published frame
+
+    def next_slot(self):
+        """Return the buffer the writer should decode the next frame into."""
+        slot = (self.write_seq + 1) % self.slots
+        self.seqs[slot] = 0  # Invalidate the frame being overwritten before touching it
+        return self.frames[slot]
+
+    def publish(self, timestamp):
+        """Publish the frame previously decoded into ``next_slot()``."""
+        seq = self.write_seq + 1
+        slot = seq % self.slots
+        self.timestamps[slot] = timestamp
+        self.seqs[slot] = seq
+        self.write_seq = seq
+        return seq
+
+    def latest(self):
+        """Return ``(seq, timestamp, frame_view)`` for the newest frame, or None."""
+        seq = self.write_seq
+        if seq == 0:
+            return None
+        return self.get(seq)
+
+    def get(self, seq):
+        """Return ``(seq, timestamp, frame_view)`` for ``seq`` if it is still in the ring."""
+        slot = seq % self.slots
+        if seq <= 0 or self.seqs[slot] != seq:
+            return None
+        view = self.frames[slot]
+        view.flags.writeable = False
+        return seq, float(self.timestamps[slot]), view
+
+    def valid(self, seq):
+        """True while frame ``seq`` has not been overwritten, or started to be"""
+        return seq > 0 and self.seqs[seq % self.slots] == seq
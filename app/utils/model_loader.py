@@ -1,28 +1,238 @@
 # app/utils/model_loader.py
 
+import copy
+import importlib.util
+import os
+import threading
+from contextlib import contextmanager
 import torch
 from ultralytics import YOLO
 import numpy as np
+from app.config import Config
 
-def initialize_pose_model(model_name='yolov8n-pose.pt', device=None):
+BACKENDS = {
+    # backend: (python module it needs, ultralytics export format)
+    'torch': (None, None),
+    'onnx': ('onnxruntime', 'onnx'),
+    'openvino': ('openvino', 'openvino'),
+}
+
+def available_backends():
+    """Inference backends whose runtime is installed"""
+    return [name for name, (module, _) in BACKENDS.items()
+            if module is None or importlib.util.find_spec(module) is not None]
+
+def export_pose_model(model_name, backend):
+    """Export the PyTorch weights for ``backend`` once and return the exported path"""
+    _, export_format = BACKENDS[backend]
+    stem = os.path.splitext(model_name)[0]
+    exported = f"{stem}.onnx" if backend == 'onnx' else f"{stem}_{export_format}_model"
+    if not os.path.exists(exported):
+        print(f"Exporting {model_name} to {backend}")
+        # Dynamic axes so a single export serves every input size
+        exported = YOLO(model_name).export(format=export_format, dynamic=True)
+    return exported
+
+def initialize_pose_model(model_name='yolov8n-pose.pt', device=None, backend='torch', imgsz=None):
     if device is None:
         device = "cuda" if torch.cuda.is_available() else "cpu"
 
     try:
-        model = YOLO(model_name)
+        if backend == 'torch':
+            model = YOLO(model_name)
+        else:
+            model = YOLO(export_pose_model(model_name, backend), task='pose')
         model.conf = 0.25
         model.iou = 0.45
         model.agnostic = True
 
         dummy_frame = np.zeros((360, 480, 3), dtype=np.uint8)
-        _ = model(dummy_frame, verbose=False)
+        _ = model(dummy_frame, verbose=False, **({'imgsz': imgsz} if imgsz else {}))
 
-        print(f"Model loaded successfully on {device}")
+        print(f"Model loaded successfully on {device} ({backend})")
         return model, device
 
     except Exception as e:
         print(f"Error loading model: {e}")
         if device == "cuda" and torch.cuda.is_available():
             print("Attempting to load on CPU instead")
-            return initialize_pose_model(model_name, "cpu")
+            return initialize_pose_model(model_name, "cpu", backend, imgsz)
+        if backend != 'torch':
+            print("Falling back to the PyTorch backend")
+            return initialize_pose_model(model_name, device, 'torch', imgsz)
         raise
+
+
+class _ModelEntry:
+    """Load state and instance pool for one (model, device) pair."""
+
+    def __init__(self, model_name, device, pool_size):
+        self.model_name = model_name
+        self.device = device
+        self.state = 'unloaded'  # unloaded -> loading -> ready | failed
+        self.error = None
+        self.model = None
+        self.backend = 'torch'
+        self.predict_kwargs = {}  # e.g. the calibrated input size
+        self.ready = threading.Event()
+        self.pool_size = pool_size
+        self.idle = []  # Instances not currently running inference
+        self.created = 0
+        self.available = threading.Semaphore(pool_size)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded pose models.
+
+    Each (model, device) pair is loaded and warmed up once, either lazily on
+    first use or in the background via ``preload``. Callers run inference
+    through ``acquire``, which hands out one of at most ``pool_size`` instances.
+    Extra instances are shallow copies that share the loaded weights and only
+    get their own predictor state, so they are cheap to create.
+
+    The registry is per process: pipeline worker processes are spawned, not
+    forked, and load their own copy of the model.
+    """
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or Config.MODEL_POOL_SIZE
+        self._entries = {}
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _key(self, model_name, device):
+        model_name = model_name or Config.POSE_MODEL_NAME
+        device = device or Config.POSE_MODEL_DEVICE or ("cuda" if torch.cuda.is_available() else "cpu")
+        return model_name, device
+
+    def _entry(self, model_name=None, device=None):
+        key = self._key(model_name, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _ModelEntry(*key, self.pool_size)
+            return entry
+
+    def _resolve_backend(self, entry):
+        """Backend settings from Config, or from (cached) calibration when set to 'auto'"""
+        if Config.POSE_BACKEND == 'auto' and entry.device == 'cpu':
+            from app.utils.backend_calibration import calibrate_pose_backend
+            return calibrate_pose_backend(entry.model_name, entry.device)
+        backend = Config.POSE_BACKEND if Config.POSE_BACKEND in BACKENDS else 'torch'
+        return {'backend': backend, 'imgsz': Config.POSE_IMGSZ, 'threads': Config.POSE_THREADS}
+
+    def _load(self, entry):
+        try:
+            settings = self._resolve_backend(entry)
+            if settings.get('threads'):
+                torch.set_num_threads(settings['threads'])
+            entry.backend = settings['backend']
+            entry.predict_kwargs = {'imgsz': settings['imgsz']} if settings.get('imgsz') else {}
+            entry.model, entry.device = initialize_pose_model(
+                entry.model_name, entry.device, entry.backend, settings.get('imgsz'))
+            entry.idle.append(entry.model)
+            entry.created = 1
+            entry.state = 'ready'
+        except Exception as e:
+            entry.error = e
+            entry.state = 'failed'
+        finally:
+            entry.ready.set()
+
+    def _start_loading(self, entry, background):
+        with self._lock:
+            if entry.state not in ('unloaded', 'failed'):
+                return
+            entry.state = 'loading'
+            entry.error = None
+            entry.ready.clear()
+        if background:
+            threading.Thread(target=self._load, args=(entry,), daemon=True,
+                             name=f"model-load-{entry.model_name}").start()
+        else:
+            self._load(entry)
+
+    def preload(self, model_name=None, device=None, wait=False):
+        """Start loading a model in the background; optionally wait for it"""
+        entry = self._entry(model_name, device)
+        self._start_loading(entry, background=True)
+        if wait:
+            entry.ready.wait()
+        return entry.state
+
+    def get(self, model_name=None, device=None, timeout=None):
+        """Return the shared model instance, loading it on first use"""
+        entry = self._entry(model_name, device)
+        self._start_loading(entry, background=False)
+        if not entry.ready.wait(timeout):
+            raise TimeoutError(f"Model {entry.model_name} is still loading")
+        if entry.state != 'ready':
+            raise RuntimeError(f"Model {entry.model_name} failed to load: {entry.error}")
+        return entry.model
+
+    @contextmanager
+    def acquire(self, model_name=None, device=None, timeout=None):
+        """Borrow one of the pooled instances for a single inference call"""
+        entry = self._entry(model_name, device)
+        self.get(model_name, device, timeout)
+        if not entry.available.acquire(timeout=timeout):
+            raise TimeoutError(f"No free {entry.model_name} instance")
+        try:
+            with self._lock:
+                if entry.idle:
+                    instance = entry.idle.pop()
+                else:
+                    # Shares the nn.Module. That is only safe because the warmup in
+                    # initialize_pose_model already fused it and put it in eval mode:
+                    # the copy's own predictor setup then finds nothing left to change,
+                    # and concurrent forward passes only read the weights. Exported
+                    # backends load their own runtime session per predictor.
+                    instance = copy.copy(entry.model)
+                    instance.predictor = None
+                    entry.created += 1
+            try:
+                yield instance
+            finally:
+                with self._lock:
+                    entry.idle.append(instance)
+        finally:
+            entry.available.release()
+
+    def predict_kwargs(self, model_name=None, device=None):
+        """Extra keyword arguments inference calls should pass, e.g. ``imgsz``"""
+        return dict(self._entry(model_name, device).predict_kwargs)
+
+    def state(self, model_name=None, device=None):
+        return self._entry(model_name, device).state
+
+    def is_ready(self, model_name=None, device=None):
+        return self.state(model_name, device) == 'ready'
+
+    def status(self):
+        """Readiness and pool usage of every known model"""
+        with self._lock:
+            return {
+                f"{entry.model_name}@{entry.device}": {
+                    'state': entry.state,
+                    'backend': entry.backend,
+                    **entry.predict_kwargs,
+                    'error': str(entry.error) if entry.error else None,
+                    'instances': entry.created,
+                    'idle': len(entry.idle),
+                    'pool_size': entry.pool_size
+                } for entry in self._entries.values()
+            }
+
+    def _reset_after_fork(self):
+        # Locks and loader threads do not survive a fork
+        self._lock = threading.Lock()
+        for entry in self._entries.values():
+            entry.available = threading.Semaphore(entry.pool_size)
+            if entry.state == 'loading':
+                entry.state = 'unloaded'
+                entry.ready = threading.Event()
+
+
+pose_models = ModelRegistry()
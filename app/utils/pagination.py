@@ -0,0 +1,71 @@
+import json
+import logging
+from flask import Response, jsonify, request, stream_with_context
+from app.config import Config
+from app.models.models import db
+
+
+def wants_ndjson():
+    """True if the client asked for a streamed NDJSON body"""
+    return (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+
+def page_args():
+    """``(after, limit)`` from the query string: the keyset cursor and a clamped page size"""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, Config.API_MAX_PAGE_SIZE))
+    return after, limit
+
+
+def keyset(statement, key, after, limit):
+    """Restrict ``statement`` to rows after cursor ``after``, ordered by ``key``"""
+    if after is not None:
+        statement = statement.where(key > after)
+    statement = statement.order_by(key)
+    return statement.limit(limit) if limit is not None else statement
+
+
+def paginated_response(statement, key, serialize, scalars=False):
+    """
+    Serve ``statement`` one keyset page at a time, or as a stream.
+
+    JSON responses are paged only when the client asks with ``after`` or
+    ``limit``; a plain request still gets every row in one array, as before
+    pagination existed. Pages hold ``limit`` rows (``API_PAGE_SIZE`` when only
+    ``after`` is given) after the ``after`` cursor, and the ``X-Next-Cursor``
+    header carries the cursor of the next page when there is one. NDJSON streams every remaining row, or
+    just ``limit`` of them, from a server-side cursor in batches of
+    ``API_STREAM_BATCH``, so memory stays flat however many rows match.
+    """
+    after, limit = page_args()
+    if wants_ndjson():
+        statement = keyset(statement, key, after, limit).execution_options(yield_per=Config.API_STREAM_BATCH)
+        return Response(stream_with_context(_stream(statement, serialize, scalars)),
+                        mimetype='application/x-ndjson')
+
+    if after is None and limit is None:
+        result = db.session.execute(keyset(statement, key, None, None))
+        return jsonify([serialize(row) for row in (result.scalars() if scalars else result)])
+
+    limit = limit or Config.API_PAGE_SIZE
+    result = db.session.execute(keyset(statement, key, after, limit + 1))  # One extra row tells if there's more
+    rows = (result.scalars() if scalars else result).all()
+    response = jsonify([serialize(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = str(rows[limit - 1].id)
+    return response
+
+
+def _stream(statement, serialize, scalars):
+    try:
+        result = db.session.execute(statement)
+        if scalars:
+            result = result.scalars()
+        for rows in result.partitions():
+            yield ''.join(json.dumps(serialize(row)) + '\n' for row in rows)
+    except Exception as e:
+        # Headers are already out; the client sees a truncated stream
+        logging.error(f"Error streaming rows: {e}", exc_info=True)
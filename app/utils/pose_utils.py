@@ -60,4 +60,65 @@ class PoseUtils:
                 prev_velocity_y = (prev_position[1] - prev_prev_position[1]) / prev_delta_time
                 acceleration = ((velocity[0] - prev_velocity_x) / delta_time, (velocity[1] - prev_velocity_y) / delta_time)
         
-        return speed, velocity, acceleration
\ No newline at end of file
+        return speed, velocity, acceleration
+
+
+# Keypoint rows in a (17, 3) pose array, named the way PunchDetector reads them
+NOSE = 0
+RIGHT_SHOULDER, LEFT_SHOULDER = 5, 6
+RIGHT_ELBOW, LEFT_ELBOW = 7, 8
+RIGHT_WRIST, LEFT_WRIST = 9, 10
+RIGHT_HIP, LEFT_HIP = 11, 12
+ARM_JOINTS = {  # side: (shoulder, elbow, wrist)
+    'right': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+}
+NUM_KEYPOINTS = 17
+
+
+class PoseFrame:
+    """
+    Compact record of everyone detected in one frame.
+
+    ``keypoints`` is a single contiguous ``(persons, 17, 3)`` float32 array of
+    x, y, confidence; ``track_ids`` holds one id per person row. Stages index
+    joints with the constants above rather than building per-person dicts.
+    """
+
+    __slots__ = ('keypoints', 'track_ids', 'timestamp', 'camera_id', 'frame_id')
+
+    def __init__(self, keypoints, track_ids=None, timestamp=0.0, camera_id=0, frame_id=0):
+        self.keypoints = np.ascontiguousarray(keypoints, dtype=np.float32).reshape(-1, NUM_KEYPOINTS, 3)
+        if track_ids is None:
+            track_ids = np.arange(len(self.keypoints), dtype=np.int64)
+        self.track_ids = np.asarray(track_ids, dtype=np.int64)
+        self.timestamp = timestamp
+        self.camera_id = camera_id
+        self.frame_id = frame_id
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    def __repr__(self):
+        return f"<PoseFrame {self.frame_id} camera {self.camera_id}: {len(self)} people>"
+
+
+def extract_keypoints(results, offset=(0, 0), timestamp=0.0, camera_id=0, frame_id=0):
+    """
+    Extracts a ``PoseFrame`` from a YOLO pose result.
+
+    ``offset`` is added to x/y when the result came from a crop of the frame.
+    """
+    if results is None or results.keypoints is None:
+        return PoseFrame(np.zeros((0, NUM_KEYPOINTS, 3), dtype=np.float32),
+                         timestamp=timestamp, camera_id=camera_id, frame_id=frame_id)
+
+    data = results.keypoints.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    if offset != (0, 0) and len(data):
+        data = np.array(data, dtype=np.float32)  # Don't shift the model's own tensor
+        data[:, :, 0] += offset[0]
+        data[:, :, 1] += offset[1]
+
+    return PoseFrame(data, timestamp=timestamp, camera_id=camera_id, frame_id=frame_id)
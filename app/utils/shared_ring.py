@@ -0,0 +1,104 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older Pythons register the block again; child processes share the
+        # creator's resource tracker, so that is a no-op and only the creator
+        # unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedRing:
+    """
+    Single-writer ring of fixed-shape records in shared memory.
+
+    ``fields`` maps a name to ``(shape, dtype)``; every slot holds one array
+    per field. The writer fills ``next_slot()`` in place and ``publish``es it
+    with a sequence number, exactly like ``FrameRingBuffer`` but readable from
+    other processes without pickling: they ``attach`` by ``spec`` and read the
+    slots directly. ``read`` checks the slot's sequence number before and
+    after, so a record the writer overwrote mid-read is reported as gone
+    instead of returned torn.
+    """
+
+    def __init__(self, fields, slots=8, name=None):
+        if slots < 2:
+            raise ValueError("SharedRing needs at least 2 slots")
+        self.fields = {key: (tuple(shape), np.dtype(dtype).str) for key, (shape, dtype) in fields.items()}
+        self.slots = slots
+        size = 8 * (slots + 1) + sum(slots * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+                                     for shape, dtype in self.fields.values())
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if self.owner else _attach(name)
+        self._map()
+
+    @classmethod
+    def attach(cls, spec):
+        """Open a ring created in another process from its ``spec``"""
+        name, fields, slots = spec
+        return cls(fields, slots, name=name)
+
+    @property
+    def spec(self):
+        """Picklable description other processes attach with"""
+        return self.shm.name, self.fields, self.slots
+
+    def _map(self):
+        buffer = self.shm.buf
+        self.header = np.ndarray((self.slots + 1,), dtype=np.int64, buffer=buffer)
+        self.seqs = self.header[:self.slots]  # Sequence number held by each slot
+        offset = self.header.nbytes
+        self.arrays = {}
+        for key, (shape, dtype) in self.fields.items():
+            array = np.ndarray((self.slots,) + shape, dtype=dtype, buffer=buffer, offset=offset)
+            self.arrays[key] = array
+            offset += array.nbytes
+
+    @property
+    def write_seq(self):
+        """Sequence number of the last published record"""
+        return int(self.header[self.slots])
+
+    def next_slot(self):
+        """Field arrays the writer fills for the next record"""
+        slot = (self.write_seq + 1) % self.slots
+        self.seqs[slot] = 0  # Mark it in progress for readers
+        return {key: array[slot] for key, array in self.arrays.items()}
+
+    def publish(self):
+        seq = self.write_seq + 1
+        self.seqs[seq % self.slots] = seq
+        self.header[self.slots] = seq
+        return seq
+
+    def read(self, seq, copy=True):
+        """
+        Fields of record ``seq`` if it is still in the ring, else None.
+
+        With ``copy=False`` the arrays are views that stay valid until the
+        writer wraps around; call ``valid(seq)`` after using them.
+        """
+        slot = seq % self.slots
+        if seq <= 0 or self.seqs[slot] != seq:
+            return None
+        record = {key: (array[slot].copy() if copy else array[slot]) for key, array in self.arrays.items()}
+        if copy and self.seqs[slot] != seq:
+            return None
+        return record
+
+    def valid(self, seq):
+        return seq > 0 and self.seqs[seq % self.slots] == seq
+
+    def close(self):
+        self.header = self.seqs = None
+        self.arrays = {}
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A reader still holds a view; the mapping goes with it
+        if self.owner:
+            self.shm.unlink()
@@ -1,102 +1,164 @@
-import asyncio
 from app import create_app
+from flask import Blueprint, current_app, jsonify, request
 from flask_socketio import SocketIO
 from flask_cors import CORS
-from app.services.fight_analyzer import AsyncFightAnalyzer
+from app.models.async_db import database
+from app.services.event_log import recover_event_logs
+from app.services.response_cache import response_cache
+from app.services.session_manager import SessionManager
 from app.socket.socket_manager import SocketManager
+from app.utils.model_loader import pose_models
 import logging
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Create Flask app
-app = create_app()
-CORS(app)
+# Dashboard routes; the app itself is only built under __main__, since
+# pipeline worker processes are spawned and re-import this module
+dashboard_bp = Blueprint('dashboard', __name__)
 
-# Initialize Socket.IO with async_mode='asyncio'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='asyncio')
+def create_server():
+    """Create the Flask app and its Socket.IO server"""
+    app = create_app()
+    CORS(app)
+    app.register_blueprint(dashboard_bp)
+    # Initialize Socket.IO; the emitter and session manager run on their own threads
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    return app, socketio
 
-# Initialize services (within the asyncio event loop)
-async def initialize_services():
-    global analyzer, socket_manager
-    analyzer = AsyncFightAnalyzer(camera_id=0)
+# Initialize services
+def initialize_services(app, socketio):
+    if app.config['MODEL_PRELOAD']:
+        pose_models.preload()  # Warm up in the background, cameras wait on it
+    recover_event_logs(app)  # Sessions cut short by a crash or reboot
+    # Sessions run on the manager's own event-loop thread
+    session_manager = SessionManager(app)
+    session_manager.start()
+    app.extensions['session_manager'] = session_manager
     socket_manager = SocketManager(socketio)
     socket_manager.register_handlers()
+    app.extensions['socket_manager'] = socket_manager
+    return session_manager
 
-# Global session tracking
-current_session_id = None
-processing_active = False
+def _session_manager():
+    return current_app.extensions['session_manager']
 
-async def frame_processing_loop():
-    """Asynchronous loop for processing camera frames"""
-    global processing_active, current_session_id
-    try:
-        while processing_active and current_session_id:
-            await analyzer.process_frame(current_session_id)
-            await asyncio.sleep(0.03)  # Aim for ~30 FPS processing rate
-    except Exception as e:
-        logging.error(f"Error in frame processing loop: {e}", exc_info=True)
-    finally:
-        processing_active = False  # Ensure loop terminates
+def _csv_ints(value):
+    return [int(x) for x in value.split(',')] if value else None
 
-@app.route('/')
+@dashboard_bp.route('/')
 def index():
     """Serve the main dashboard page"""
-    return app.send_static_file('index.html')
+    return current_app.send_static_file('index.html')
 
-@app.route('/start_session/<fighter_ids>', methods=['POST'])
-async def start_session(fighter_ids):
-    global current_session_id, processing_active
-    
-    # Parse fighter IDs
+@dashboard_bp.route('/start_session/<fighter_ids>', methods=['POST'])
+def start_session(fighter_ids):
+    """
+    Start a session; ``cameras``, ``priority`` and ``cpu_budget`` query
+    arguments choose its cameras and its share of the server.
+    """
+    # Parse fighter IDs and options
     try:
-        fighter_id_list = [int(id) for id in fighter_ids.split(',')]
+        fighter_id_list = _csv_ints(fighter_ids)
+        camera_ids = _csv_ints(request.args.get('cameras'))
+        priority = request.args.get('priority', type=float)
+        cpu_budget = request.args.get('cpu_budget', type=float)
     except ValueError:
-        return jsonify({'error': 'Invalid fighter IDs'}), 400
-    
+        return jsonify({'error': 'Invalid fighter or camera IDs'}), 400
+
     try:
-        # Start a new session
-        current_session_id = await analyzer.start_session(fighter_id_list)
-        
-        # Start processing 
-        processing_active = True
-        asyncio.create_task(frame_processing_loop())
-        socket_manager.start_monitoring()
-        
+        session_id = _session_manager().start_session(fighter_id_list, camera_ids, priority, cpu_budget)
+        current_app.extensions['socket_manager'].start_monitoring()
+
         return jsonify({
-            'session_id': current_session_id,
+            'session_id': session_id,
             'status': 'started'
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logging.error(f"Error starting session: {e}", exc_info=True)
         return jsonify({'error': 'Could not start session'}), 500
 
-@app.route('/end_session', methods=['POST'])
-async def end_session():
-    global current_session_id, processing_active
-    
-    if current_session_id:
-        processing_active = False
-        try:
-            await analyzer.end_session(current_session_id)
-            socket_manager.stop_monitoring()
-            session_id = current_session_id
-            current_session_id = None
-            return jsonify({
-                'session_id': session_id,
-                'status': 'ended'
-            }), 200
-        except Exception as e:
-            logging.error(f"Error ending session: {e}", exc_info=True)
-            return jsonify({'error': 'Could not end session'}), 500
-    else:
+@dashboard_bp.route('/end_session', methods=['POST'])
+@dashboard_bp.route('/end_session/<int:session_id>', methods=['POST'])
+def end_session(session_id=None):
+    """End one session, or the most recently started one when none is given"""
+    session_manager = _session_manager()
+    if session_id is None:
+        active = session_manager.active_session_ids()
+        session_id = active[-1] if active else None
+    if session_id is None:
         return jsonify({'error': 'No active session'}), 404
 
-if __name__ == '__main__':
-    async def run_app():
-        await initialize_services()  # Initialize services
-        logging.info("Starting server on http://0.0.0.0:5000")
-        await socketio.run(app, debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
+    try:
+        # Viewers get 'session_ended' once everything is drained
+        if not session_manager.end_session(session_id):
+            return jsonify({'error': 'No active session'}), 404
+        return jsonify({
+            'session_id': session_id,
+            'status': 'ended'
+        }), 200
+    except Exception as e:
+        logging.error(f"Error ending session: {e}", exc_info=True)
+        return jsonify({'error': 'Could not end session'}), 500
 
-    asyncio.run(run_app())
\ No newline at end of file
+@dashboard_bp.route('/sessions', methods=['GET'])
+def sessions():
+    """State, scheduling share and counters of every live session"""
+    return jsonify({str(session_id): status for session_id, status in _session_manager().status().items()})
+
+@dashboard_bp.route('/top_combinations', methods=['GET'])
+@dashboard_bp.route('/top_combinations/<int:session_id>', methods=['GET'])
+def top_combinations(session_id=None):
+    """Most frequent combinations of each fighter in a live session"""
+    session_manager = _session_manager()
+    if session_id is None:
+        active = session_manager.active_session_ids()
+        session_id = active[-1] if active else None
+    analyzer = session_manager.get_analyzer(session_id)
+    if analyzer is None:
+        return jsonify({'error': 'No active session'}), 404
+    k = request.args.get('k', type=int)
+    return jsonify({str(fighter_id): [{'sequence': sequence, 'count': count} for sequence, count in combos]
+                    for fighter_id, combos in analyzer.get_top_combinations(session_id, k).items()})
+
+@dashboard_bp.route('/camera_health', methods=['GET'])
+def camera_health():
+    """Per-camera capture and inference health of every live session"""
+    session_manager = _session_manager()
+    health = {}
+    for session_id in session_manager.status():
+        analyzer = session_manager.get_analyzer(session_id)
+        if analyzer is not None:
+            health.update({str(camera_id): dict(status, session_id=session_id)
+                           for camera_id, status in analyzer.get_frame_stats().items()})
+    return jsonify(health)
+
+@dashboard_bp.route('/persistence_status', methods=['GET'])
+def persistence_status():
+    """Write-behind queue depth and backpressure counters"""
+    return jsonify(_session_manager().get_persistence_stats())
+
+@dashboard_bp.route('/cache_status', methods=['GET'])
+def cache_status():
+    """Hit, invalidation and size counters of the API response cache"""
+    return jsonify(response_cache.status())
+
+@dashboard_bp.route('/model_status', methods=['GET'])
+def model_status():
+    """Readiness of the shared pose models"""
+    return jsonify(pose_models.status())
+
+if __name__ == '__main__':
+    app, socketio = create_server()
+    session_manager = initialize_services(app, socketio)
+    logging.info("Starting server on http://0.0.0.0:5000")
+    try:
+        # No reloader: it would start a second copy of the session manager and cameras
+        socketio.run(app, debug=app.config['DEBUG'], host='0.0.0.0', port=5000,
+                     use_reloader=False, allow_unsafe_werkzeug=True)
+    finally:
+        session_manager.shutdown()  # Drain whatever is still running
+        database.close()
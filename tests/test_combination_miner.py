@@ -0,0 +1,101 @@
+import random
+from app.services.combination_miner import CombinationMiner
+
+
+def miner(**overrides):
+    settings = dict(max_gap=1.0, window=5.0, min_length=2, max_length=4, top_k=3)
+    settings.update(overrides)
+    return CombinationMiner(**settings)
+
+
+def feed(combos, fighter_id, punches):
+    """Add ``(punch_type, timestamp)`` punches, returning every occurrence completed"""
+    return [occurrence for punch_type, timestamp in punches
+            for occurrence in combos.add(fighter_id, punch_type, timestamp)]
+
+
+def test_add_returns_the_suffixes_each_punch_completes():
+    combos = miner()
+    assert combos.add(1, "Jab", 0.0) == []
+    assert combos.add(1, "Cross", 0.5) == [(("Jab", "Cross"), 0.0, 0.5)]
+    assert combos.add(1, "Hook", 1.0) == [(("Cross", "Hook"), 0.5, 1.0),
+                                          (("Jab", "Cross", "Hook"), 0.0, 1.0)]
+
+
+def test_gap_breaks_the_flurry():
+    combos = miner()
+    feed(combos, 1, [("Jab", 0.0), ("Cross", 0.5)])
+    assert combos.add(1, "Hook", 1.6) == []  # 1.1s after the cross
+    assert combos.add(1, "Uppercut", 2.0) == [(("Hook", "Uppercut"), 1.6, 2.0)]
+    assert combos.count(1, ["Cross", "Hook"]) == 0
+    assert combos.count(1, ["Jab", "Cross"]) == 1
+
+
+def test_flurry_is_bounded_by_window_and_length():
+    punches = [("Jab", i * 0.5) for i in range(10)]
+    occurrences = feed(miner(window=1.2, max_length=6), 1, punches)
+    assert max(end - start for _, start, end in occurrences) == 1.0
+    occurrences = feed(miner(window=5.0, max_length=3), 1, punches)
+    assert max(len(sequence) for sequence, _, _ in occurrences) == 3
+
+
+def test_end_flurries_keeps_counts():
+    combos = miner()
+    feed(combos, 1, [("Jab", 0.0), ("Cross", 0.5)])
+    combos.end_flurries()
+    assert combos.add(1, "Hook", 0.8) == []
+    assert combos.count(1, ["Jab", "Cross"]) == 1
+
+
+def test_repeated_sequence_counted_once_per_occurrence():
+    combos = miner()
+    feed(combos, 1, [("Jab", 0.0), ("Cross", 0.5)])
+    feed(combos, 1, [("Jab", 10.0), ("Cross", 10.5)])
+    # Twice more inside one flurry, overlapping the cross-jab in between
+    feed(combos, 1, [("Jab", 20.0), ("Cross", 20.5), ("Jab", 21.0), ("Cross", 21.5)])
+    assert combos.count(1, ["Jab", "Cross"]) == 4
+    assert combos.count(1, ["Cross", "Jab"]) == 1
+    assert combos.count(1, ["Jab", "Cross", "Jab", "Cross"]) == 1
+    assert combos.top(1, 1) == [("Jab-Cross", 4)]
+    assert combos.top(2) == []
+
+
+def test_fighters_are_counted_separately():
+    combos = miner()
+    feed(combos, 1, [("Jab", 0.0), ("Cross", 0.5)])
+    feed(combos, 2, [("Hook", 0.2), ("Hook", 0.6)])
+    assert combos.top(1) == [("Jab-Cross", 1)]
+    assert combos.top(2) == [("Hook-Hook", 1)]
+
+
+def test_top_leader_replaced_once_a_new_sequence_passes_it():
+    combos = miner(top_k=1)
+    feed(combos, 1, [("Jab", 0.0), ("Cross", 0.5)])
+    assert combos.top(1) == [("Jab-Cross", 1)]
+    feed(combos, 1, [("Hook", 10.0), ("Uppercut", 10.5)])
+    assert combos.top(1) == [("Jab-Cross", 1)]  # A tie doesn't take the place
+    feed(combos, 1, [("Hook", 20.0), ("Uppercut", 20.5)])
+    assert combos.top(1) == [("Hook-Uppercut", 2)]
+    feed(combos, 1, [("Jab", 30.0), ("Cross", 30.5), ("Jab", 40.0), ("Cross", 40.5)])
+    assert combos.top(1) == [("Jab-Cross", 3)]
+
+
+def all_counts(node, counts):
+    for child in node.children.values():
+        if child.count:
+            counts[child.sequence] = child.count
+        all_counts(child, counts)
+    return counts
+
+
+def test_leaders_match_a_full_scan():
+    rng = random.Random(0)
+    combos = miner(top_k=5)
+    timestamp = 0.0
+    for _ in range(2000):
+        timestamp += rng.choice([0.3, 0.6, 0.9, 2.0])
+        combos.add(1, rng.choice(["Jab", "Cross", "Hook"]), timestamp)
+        counts = all_counts(combos.fighters[1].root, {})
+        leaders = combos.top(1)
+        assert [count for _, count in leaders] == sorted(counts.values(), reverse=True)[:5]
+        assert all(combos.count(1, sequence.split("-")) == count for sequence, count in leaders)
@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+import pytest
+from flask import Flask
+from app.config import Config
+from app.models.models import db, Fighter, Session, PunchData, Combination, PunchStat
+from app.services.event_log import (HEADER, RECORD_SIZE, SessionEventLog, read_event_log,
+                                    recover_event_logs, replay_event_log)
+
+PUNCHES = [
+    (1, "Jab Left", 1000.25, 4.5, 1.5),
+    (1, "Straight Right", 1000.5, 6.0, 2.25),
+    (2, "Hook Left", 1001.0, 5.5, None),
+    (1, "Jab Left", 1002.0, 4.0, 1.0),
+]
+COMBINATIONS = [
+    (1, ["Jab Left", "Straight Right"], 1000.25, 1000.5),
+    (1, ["Jab Left", "Straight Right"], 1003.0, 1003.5),
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Fighter(name=name, weight_class="Middleweight", height=180, reach=185,
+                                    stance="Orthodox") for name in ("Red", "Blue")])
+        # Started ten seconds before the first punch, on the punches' clock
+        started = datetime.fromtimestamp(PUNCHES[0][2] - 10, timezone.utc).replace(tzinfo=None)
+        db.session.add(Session(date=started, duration=0))
+        db.session.commit()
+        yield app
+
+
+def write_log(path, session_id=1):
+    log = SessionEventLog(session_id, path=str(path))
+    for fighter_id, punch_type, timestamp, speed, power in PUNCHES:
+        log.append_punch(fighter_id, punch_type, timestamp, speed, power, x=10.0, y=20.0)
+    for fighter_id, punch_types, start, end in COMBINATIONS:
+        log.append_combination(fighter_id, punch_types, start, end)
+    log.close()
+    return path
+
+
+def stored_punches():
+    return sorted((p.fighter_id, p.punch_type, p.timestamp) for p in db.session.scalars(db.select(PunchData)))
+
+
+def test_round_trip(tmp_path):
+    session_id, punches, combinations = read_event_log(write_log(tmp_path / "session_1.evlog"))
+    assert session_id == 1
+    assert [(p['fighter_id'], p['punch_type'], p['timestamp'], p['speed'], p['power'] or None)
+            for p in punches] == PUNCHES
+    assert all((p['x_position'], p['y_position']) == (10.0, 20.0) for p in punches)
+    assert combinations == [(1, "Jab Left-Straight Right", 1000.25, 1000.5),
+                            (1, "Jab Left-Straight Right", 1003.0, 1003.5)]
+
+
+def test_unknown_punch_type_reads_back_as_other(tmp_path):
+    log = SessionEventLog(1, path=str(tmp_path / "session_1.evlog"))
+    log.append_punch(1, "Haymaker", 1000.0, 3.0)
+    log.close()
+    assert read_event_log(log.path)[1][0]['punch_type'] == "Other"
+
+
+def test_truncated_last_record_is_skipped(tmp_path):
+    path = write_log(tmp_path / "session_1.evlog")
+    with open(path, 'r+b') as f:
+        f.truncate(HEADER.size + 5 * RECORD_SIZE + RECORD_SIZE // 2)
+    _, punches, combinations = read_event_log(path)
+    assert len(punches) == 4
+    assert len(combinations) == 1
+
+
+def test_corrupt_last_record_is_skipped(tmp_path):
+    path = write_log(tmp_path / "session_1.evlog")
+    with open(path, 'r+b') as f:
+        f.seek(HEADER.size + 5 * RECORD_SIZE + 10)
+        byte = f.read(1)
+        f.seek(-1, 1)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    _, punches, combinations = read_event_log(path)
+    assert len(punches) == 4
+    assert len(combinations) == 1
+
+
+def test_replay_writes_punches_stats_and_combinations(app, tmp_path):
+    path = write_log(tmp_path / "session_1.evlog")
+    assert replay_event_log(str(path)) == 4
+    assert not path.exists()
+    assert stored_punches() == sorted((f, t, ts) for f, t, ts, _, _ in PUNCHES)
+    jabs = db.session.scalars(db.select(PunchStat).filter_by(fighter_id=1, punch_type="Jab Left")).one()
+    assert (jabs.count, jabs.speed_sum, jabs.speed_max) == (2, 8.5, 4.5)
+    combo = db.session.scalars(db.select(Combination)).one()
+    assert (combo.sequence, combo.frequency, combo.start_time, combo.end_time) == \
+           ("Jab Left-Straight Right", 2, 1000.25, 1003.5)
+
+
+def test_replay_after_partial_write_does_not_duplicate(app, tmp_path):
+    path = write_log(tmp_path / "session_1.evlog")
+    # The persistence worker got the first two punches in before the crash
+    _, punches, _ = read_event_log(path)
+    db.session.add_all([PunchData(**punch) for punch in punches[:2]])
+    db.session.commit()
+
+    assert replay_event_log(str(path), remove=False) == 2
+    assert replay_event_log(str(path), remove=False) == 0
+    assert stored_punches() == sorted((f, t, ts) for f, t, ts, _, _ in PUNCHES)
+
+
+def test_replay_rebuilds_combinations(app, tmp_path):
+    db.session.add(Combination(session_id=1, fighter_id=1, sequence="Jab Left-Straight Right",
+                               start_time=1000.25, end_time=1000.5, frequency=1))
+    db.session.add(Combination(session_id=1, fighter_id=2, sequence="Hook Left-Hook Right",
+                               start_time=1001.0, end_time=1001.2, frequency=3))
+    db.session.commit()
+
+    replay_event_log(str(write_log(tmp_path / "session_1.evlog")))
+    db.session.expire_all()
+    combos = db.session.scalars(db.select(Combination)).all()
+    assert [(c.fighter_id, c.sequence, c.frequency) for c in combos] == [(1, "Jab Left-Straight Right", 2)]
+
+
+def test_recover_event_logs(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENT_LOG_DIR', str(tmp_path))
+    path = write_log(tmp_path / "session_1.evlog")
+    assert recover_event_logs(app) == 4
+    assert not path.exists()
+    assert len(stored_punches()) == 4
+    session = db.session.get(Session, 1)
+    db.session.refresh(session)
+    assert session.duration == 11  # Up to the last punch
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from app.services.punch_detector import PunchDetector, VectorizedPunchDetector
+from app.utils.pose_utils import NUM_KEYPOINTS, PoseFrame
+
+FRAMES = 600
+FPS = 30.0
+
+
+def keypoint_sequence(persons, seed=0):
+    """Deterministic ``(time, keypoints)`` frames of ``persons`` people moving their arms"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(100, 500, (persons, NUM_KEYPOINTS, 2))
+    timestamp = 1000.0
+    for _ in range(FRAMES):
+        timestamp += 1.0 / FPS
+        # Some people move each frame, some in bursts large enough to be punches
+        moving = rng.random((persons, 1, 1)) < 0.5
+        positions += rng.normal(0, 12, positions.shape) * moving
+        confidence = rng.uniform(0.2, 1.0, (persons, NUM_KEYPOINTS, 1))
+        confidence[rng.random(persons) < 0.8] = 0.9  # Mostly fully visible
+        yield timestamp, np.concatenate([positions, confidence], axis=2).astype(np.float32)
+
+
+def run_both(persons):
+    scalar, vectorized = PunchDetector(), VectorizedPunchDetector()
+    expected, actual = [], []
+    for timestamp, keypoints in keypoint_sequence(persons):
+        pose = PoseFrame(keypoints, timestamp=timestamp)
+        for person_id in range(persons):
+            punch = scalar.detect_punch_type(pose.keypoints[person_id], person_id, timestamp)
+            if punch:
+                expected.append((person_id, punch))
+        actual.extend(vectorized.detect_frame(pose, keys=list(range(persons))))
+    return expected, actual
+
+
+@pytest.mark.parametrize('persons', [1, 4, 9])
+def test_vectorized_detector_matches_scalar(persons):
+    expected, actual = run_both(persons)
+    assert expected, "the sequence should contain punches"
+    assert [(person_id, punch['type'], punch['timestamp']) for person_id, punch in expected] == \
+           [(row, punch['type'], punch['timestamp']) for row, punch in actual]
+    for (_, want), (_, got) in zip(expected, actual):
+        # PunchDetector computes in the keypoints' float32, the vectorized one in float64
+        assert got['speed'] == pytest.approx(want['speed'], rel=1e-5)
+        assert got['power'] == pytest.approx(want['power'], rel=1e-5)
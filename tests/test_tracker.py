@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+from app.services import tracker
+from app.services.tracker import PoseTracker, _greedy_assignment, iou_matrix, keypoint_boxes
+from app.utils.pose_utils import NUM_KEYPOINTS, PoseFrame
+
+
+def person(x, y, width=100, height=200):
+    """Keypoints spread over the box ``(x, y, x + width, y + height)``"""
+    return np.stack([np.linspace(x, x + width, NUM_KEYPOINTS), np.linspace(y, y + height, NUM_KEYPOINTS),
+                     np.full(NUM_KEYPOINTS, 0.9)], axis=1)
+
+
+def frame(timestamp, *people):
+    return PoseFrame(np.array(people).reshape(-1, NUM_KEYPOINTS, 3), timestamp=timestamp)
+
+
+@pytest.fixture(params=['hungarian', 'greedy'])
+def assignment(request, monkeypatch):
+    if request.param == 'greedy':
+        monkeypatch.setattr(tracker, 'linear_sum_assignment', None)
+    elif tracker.linear_sum_assignment is None:
+        pytest.skip("scipy is not installed")
+    return request.param
+
+
+def test_keypoint_boxes_ignore_low_confidence_joints():
+    keypoints = person(100, 50)[None]
+    keypoints[0, 0, :] = (0, 0, 0.1)
+    keypoints[0, 5:, 2] = 0.0  # Only joints 1-4 stay visible
+    assert keypoint_boxes(np.zeros((1, NUM_KEYPOINTS, 3))).tolist() == [[0, 0, 0, 0]]
+    x0, y0, x1, y1 = keypoint_boxes(keypoints)[0]
+    assert (x0, y0) == (pytest.approx(106.25), pytest.approx(62.5))
+    assert (x1, y1) == (pytest.approx(125.0), pytest.approx(100.0))
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [0, 0, 0, 0]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 1 / 3, 0.0], [0.0, 0.0, 0.0]])
+
+
+def test_greedy_assignment_takes_cheapest_pairs_first():
+    cost = np.array([[0.1, 0.2, 0.9],
+                     [0.3, 0.8, 0.4]])
+    rows, cols = _greedy_assignment(cost)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 0), (1, 2)]
+
+
+def test_ids_stay_stable_as_people_move(assignment):
+    tracks = PoseTracker(iou_threshold=0.3, idle_timeout=1.0)
+    pose = frame(0.0, person(100, 100), person(400, 100))
+    assert tracks.update(pose) == []
+    first, second = pose.track_ids.tolist()
+    assert first != second
+
+    for step in range(1, 20):
+        # Both drift right; the detector reports them in either order
+        people = [person(100 + 5 * step, 100), person(400 + 5 * step, 100 + step)]
+        if step % 2:
+            pose = frame(step / 30, people[1], people[0])
+            assert tracks.update(pose) == []
+            assert pose.track_ids.tolist() == [second, first]
+        else:
+            pose = frame(step / 30, *people)
+            assert tracks.update(pose) == []
+            assert pose.track_ids.tolist() == [first, second]
+    assert tracks.live_tracks == 2
+
+
+def test_overlapping_people_keep_their_ids(assignment):
+    tracks = PoseTracker(iou_threshold=0.3, idle_timeout=1.0)
+    pose = frame(0.0, person(100, 100), person(160, 100))
+    tracks.update(pose)
+    ids = pose.track_ids.tolist()
+    pose = frame(0.1, person(165, 100), person(105, 100))
+    tracks.update(pose)
+    assert pose.track_ids.tolist() == ids[::-1]
+
+
+def test_match_below_iou_threshold_opens_a_new_track(assignment):
+    tracks = PoseTracker(iou_threshold=0.3, idle_timeout=1.0)
+    pose = frame(0.0, person(100, 100))
+    tracks.update(pose)
+    (first,) = pose.track_ids.tolist()
+
+    pose = frame(0.1, person(140, 100))  # IoU 60/140
+    tracks.update(pose)
+    assert pose.track_ids.tolist() == [first]
+
+    pose = frame(0.2, person(220, 100))  # IoU 20/180
+    tracks.update(pose)
+    (jumped,) = pose.track_ids.tolist()
+    assert jumped != first
+    assert tracks.live_tracks == 2
+
+
+def test_idle_tracks_are_evicted(assignment):
+    tracks = PoseTracker(iou_threshold=0.3, idle_timeout=1.0)
+    pose = frame(0.0, person(100, 100), person(400, 100))
+    tracks.update(pose)
+    staying, leaving = pose.track_ids.tolist()
+
+    # Only the first person stays in view
+    for timestamp in (0.5, 1.0):
+        pose = frame(timestamp, person(100, 100))
+        assert tracks.update(pose) == []
+    pose = frame(1.5, person(100, 100))
+    assert tracks.update(pose) == [leaving]
+    assert pose.track_ids.tolist() == [staying]
+    assert tracks.live_tracks == 1
+
+    # Coming back opens a new track rather than reusing the evicted id
+    pose = frame(1.6, person(100, 100), person(400, 100))
+    assert tracks.update(pose) == []
+    assert pose.track_ids[0] == staying
+    assert pose.track_ids[1] not in (staying, leaving)
+
+
+def test_empty_frames_still_evict(assignment):
+    tracks = PoseTracker(iou_threshold=0.3, idle_timeout=1.0)
+    pose = frame(0.0, person(100, 100), person(400, 100))
+    tracks.update(pose)
+    ids = pose.track_ids.tolist()
+
+    empty = frame(0.5)
+    assert len(empty) == 0
+    assert tracks.update(empty) == []
+    assert sorted(tracks.update(frame(2.0))) == sorted(ids)
+    assert tracks.live_tracks == 0